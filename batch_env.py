@@ -0,0 +1,350 @@
+"""
+Many headless Saboteur games stepped together, for self-play data generation.
+The stacked NumPy arrays are the state of the games, one row per game: a step plays one action in every game
+and a reset deals new games with a handful of batch operations, with no environment object per game.
+The rules are those of SaboteurBaseEnvironment, and game i plays out exactly like
+SaboteurBaseEnvironment(seed=game_seeds[i]) given the same actions, which is how the two are checked against each other.
+
+Actions are integers in a fixed action space. For every hand slot h there are SLOT_ACTIONS actions starting at h * SLOT_ACTIONS:
+- PLACE_OFFSET + cell * 2 + rotation places the path card of the slot, cell being y * BOARD_WIDTH + x;
+- CARD_OFFSET + argument plays the action card of the slot: the cell of a dynamite, the goal index of a map,
+  or target * len(TOOLS) + tool index of a sabotage or a mend;
+- DISCARD_OFFSET discards the card of the slot.
+PASS_ACTION, after all the slots, passes when the hand is empty.
+"""
+import random
+import numpy as np
+from card import CARD_TYPES, PathCard, NORTH, EAST, SOUTH, WEST, EXIT_BITS, turn_exit_mask
+from deck import DECK_TEMPLATE
+from game_board import (BOARD_WIDTH, BOARD_HEIGHT, BOARD_CELLS, CELL_OCCUPIED, CELL_START, CELL_GOAL, CELL_REVEALED, NEIGHBOURS,
+                        OPPOSITE_EXIT, EMPTY_CELL_ID, REQUIRE_TOUCHING, requirement_grid, cell_code)
+from saboteur_base_environment import TOOLS, HAND_SIZE, NUM_PLAYERS, EMPTY_SLOT, flip_tool
+from determinization import ROLES
+
+DECK_SIZE = len(DECK_TEMPLATE)
+
+PLACE_OFFSET = 0
+CARD_OFFSET = 2 * BOARD_CELLS
+DISCARD_OFFSET = CARD_OFFSET + BOARD_CELLS
+SLOT_ACTIONS = DISCARD_OFFSET + 1
+PASS_ACTION = HAND_SIZE * SLOT_ACTIONS
+NUM_ACTIONS = PASS_ACTION + 1
+
+# what each type id can do, indexed by type id: the exit mask of a path card (0 for anything else)
+# and the kind of an action card (0 for anything else)
+MAP, SABOTAGE, MEND, DYNAMITE = 1, 2, 3, 4
+_ACTION_KIND_CODES = {'map': MAP, 'sabotage': SABOTAGE, 'mend': MEND, 'dynamite': DYNAMITE}
+EXIT_MASKS = np.zeros(256, dtype=np.uint16)
+ACTION_KINDS = np.zeros(256, dtype=np.uint8)
+# the cell code of a path card on the board and, for every exit bit, the exits a tunnel entering there reaches
+CELL_CODES = np.zeros(256, dtype=np.uint8)
+LINKS = np.zeros((256, WEST + 1), dtype=np.uint8)
+for _card in CARD_TYPES:
+    if isinstance(_card, PathCard):
+        EXIT_MASKS[_card.get_type_id()] = _card.get_exit_mask()
+        CELL_CODES[_card.get_type_id()] = cell_code(_card)
+        LINKS[_card.get_type_id()] = _card._links
+    else:
+        ACTION_KINDS[_card.get_type_id()] = _ACTION_KIND_CODES[_card.get_action()]
+del _card
+# the exit masks of the path cards as bytes, as dealt and turned, for the placements of legal_mask
+PLACE_MASKS = EXIT_MASKS.astype(np.uint8)
+TURNED_PLACE_MASKS = np.array([turn_exit_mask(mask) for mask in PLACE_MASKS], dtype=np.uint8)
+
+# the layout of every new board, as in GameBoard
+_START_INDEX = 10 * BOARD_WIDTH + 6
+_GOAL_CELLS = np.array([(14, 8), (14, 10), (14, 12)])
+GOAL_INDICES = _GOAL_CELLS[:, 1] * BOARD_WIDTH + _GOAL_CELLS[:, 0]
+_START_ID = PathCard.cross_road(special_card='start').get_type_id()
+_GOAL_ID = PathCard.cross_road(special_card='goal').get_type_id()
+_GOLD_ID = PathCard.cross_road(special_card='gold').get_type_id()
+_TOOL_BITS = np.array(TOOLS, dtype=np.uint8)
+_ROLE_POOL = ['Gold-Digger'] * 6 + ['Saboteur'] * 3
+_GOLD_DIGGER = ROLES.index('Gold-Digger')
+_SABOTEUR = ROLES.index('Saboteur')
+
+# for every cell, its neighbour through each exit of EXIT_BITS, and whether it is on the board
+_NEIGHBOUR_CELLS = np.zeros((BOARD_CELLS, len(EXIT_BITS)), dtype=np.intp)
+_NEIGHBOUR_ON_BOARD = np.zeros((BOARD_CELLS, len(EXIT_BITS)), dtype=bool)
+for _idx, _neighbours in enumerate(NEIGHBOURS):
+    for _exit, _neighbour_idx in _neighbours:
+        _NEIGHBOUR_CELLS[_idx, EXIT_BITS.index(_exit)] = _neighbour_idx
+        _NEIGHBOUR_ON_BOARD[_idx, EXIT_BITS.index(_exit)] = True
+del _idx, _neighbours, _exit, _neighbour_idx
+_EXIT_BITS = np.array(EXIT_BITS, dtype=np.uint8)
+_OPPOSITE_BITS = np.array([OPPOSITE_EXIT[bit] for bit in EXIT_BITS], dtype=np.uint8)
+
+# (exit, opposite exit, slice of the cells that have a neighbour that way, slice of those neighbours)
+_SHIFTS = (
+    (NORTH, SOUTH, np.s_[:, 1:, :], np.s_[:, :-1, :]),
+    (SOUTH, NORTH, np.s_[:, :-1, :], np.s_[:, 1:, :]),
+    (EAST, WEST, np.s_[:, :, :-1], np.s_[:, :, 1:]),
+    (WEST, EAST, np.s_[:, :, 1:], np.s_[:, :, :-1]),
+)
+
+
+class BatchSaboteurEnv():
+    """
+    num_games games played in lockstep. The state, one row per game:
+    - cells: (num_games, BOARD_HEIGHT, BOARD_WIDTH) cell codes (exit mask and flags, see game_board);
+    - card_ids: (num_games, BOARD_CELLS) type id of the card in each cell, EMPTY_CELL_ID for empty cells;
+    - connected: (num_games, BOARD_CELLS) the exits of each card a tunnel from the start card reaches (see GameBoard);
+    - hands: (num_games, NUM_PLAYERS, HAND_SIZE) type ids of every hand in hand order, EMPTY_SLOT after the last card;
+    - deck, deck_top: (num_games, DECK_SIZE) type ids of the deck and how many are left, the top card at deck_top - 1;
+    - current: (num_games,) the index of the player to move;
+    - broken_tools, peeked: (num_games, NUM_PLAYERS) the broken-tool bitmasks and the bitmasks of the goals looked at;
+    - roles: (num_games, NUM_PLAYERS) indices in determinization.ROLES;
+    - gold: (num_games,) the index of the goal holding the gold, gold_found: (num_games,) whether it has been reached.
+    Every game gets its own seed from the seed of the batch, so a batch replays exactly.
+    """
+
+    def __init__(self, num_games, seed=None):
+        self.num_games = num_games
+        self._seeds = random.Random(seed)
+        self.game_seeds = np.zeros(num_games, dtype=np.int64)
+        self.cells = np.zeros((num_games, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.uint8)
+        self._cells = self.cells.reshape(num_games, BOARD_CELLS)
+        self.card_ids = np.zeros((num_games, BOARD_CELLS), dtype=np.uint8)
+        self.connected = np.zeros((num_games, BOARD_CELLS), dtype=np.uint8)
+        self.hands = np.zeros((num_games, NUM_PLAYERS, HAND_SIZE), dtype=np.uint8)
+        self.deck = np.zeros((num_games, DECK_SIZE), dtype=np.uint8)
+        self.deck_top = np.zeros(num_games, dtype=np.intp)
+        self.current = np.zeros(num_games, dtype=np.intp)
+        self.broken_tools = np.zeros((num_games, NUM_PLAYERS), dtype=np.uint8)
+        self.peeked = np.zeros((num_games, NUM_PLAYERS), dtype=np.uint8)
+        self.roles = np.zeros((num_games, NUM_PLAYERS), dtype=np.uint8)
+        self.gold = np.zeros(num_games, dtype=np.intp)
+        self.gold_found = np.zeros(num_games, dtype=bool)
+        self._mask = np.zeros((num_games, NUM_ACTIONS), dtype=bool)
+        self.reset()
+
+    def reset(self, done_mask=None):
+        """Deals a new game in every slot where done_mask is True (every slot by default)."""
+        indices = np.arange(self.num_games) if done_mask is None else np.flatnonzero(done_mask)
+        if len(indices) == 0:
+            return
+        decks = np.empty((len(indices), DECK_SIZE), dtype=np.uint8)
+        for row, index in enumerate(indices):
+            # the same draws from the game's generator as SaboteurBaseEnvironment.__init__:
+            # the gold card (GameBoard), the shuffle (Deck) and the roles
+            game_seed = self._seeds.getrandbits(63)
+            rng = random.Random(game_seed)
+            self.game_seeds[index] = game_seed
+            self.gold[index] = rng.choice([0, 1, 2])
+            deck = list(DECK_TEMPLATE)
+            rng.shuffle(deck)
+            decks[row] = deck
+            self.roles[index] = [ROLES.index(role) for role in rng.sample(_ROLE_POOL, NUM_PLAYERS)]
+
+        self.card_ids[indices] = EMPTY_CELL_ID
+        self.card_ids[indices, _START_INDEX] = _START_ID
+        self.card_ids[indices[:, np.newaxis], GOAL_INDICES] = _GOAL_ID
+        self.card_ids[indices, GOAL_INDICES[self.gold[indices]]] = _GOLD_ID
+        self._cells[indices] = 0
+        self._cells[indices, _START_INDEX] = CELL_CODES[_START_ID]
+        self._cells[indices[:, np.newaxis], GOAL_INDICES] = CELL_CODES[_GOAL_ID]
+        self.connected[indices] = 0
+        self.connected[indices, _START_INDEX] = EXIT_MASKS[_START_ID]
+
+        # Deck.deal: every hand in turn takes the next HAND_SIZE cards from the top, the top card first
+        dealt = NUM_PLAYERS * HAND_SIZE
+        self.hands[indices] = decks[:, DECK_SIZE - dealt:][:, ::-1].reshape(-1, NUM_PLAYERS, HAND_SIZE)
+        self.deck[indices] = decks
+        self.deck_top[indices] = DECK_SIZE - dealt
+        self.current[indices] = 0
+        self.broken_tools[indices] = 0
+        self.peeked[indices] = 0
+        self.gold_found[indices] = False
+
+    def current_hands(self):
+        """Returns the (num_games, HAND_SIZE) hands of the players to move."""
+        return self.hands[np.arange(self.num_games), self.current]
+
+    def legal_mask(self):
+        """
+        Returns a (num_games, NUM_ACTIONS) bool array of the legal actions of the player to move in every game.
+        The array is reused by the next call.
+        """
+        num_games = self.num_games
+        mask = self._mask
+        mask[:] = False
+        slots = mask[:, :PASS_ACTION].reshape(num_games, HAND_SIZE, SLOT_ACTIONS)
+        hands = self.current_hands()
+        present = hands != EMPTY_SLOT
+        games = np.arange(num_games)
+
+        # placements: every path card against every cell, unless the player has a broken tool. The rule of
+        # game_board.PLACEMENT_FITS is applied with byte operations, which beats looking it up for so many cells:
+        # some exit runs into a card and every card the exits run into faces back
+        can_place = (self.broken_tools[games, self.current] == 0)[:, np.newaxis]
+        requirement = requirement_grid(self.cells).astype(np.uint8).reshape(num_games, 1, BOARD_CELLS)
+        touching = requirement & REQUIRE_TOUCHING
+        not_facing = ~(requirement >> 4)
+        places = slots[:, :, PLACE_OFFSET:CARD_OFFSET].reshape(num_games, HAND_SIZE, BOARD_CELLS, 2)
+        for rotation, exit_masks in enumerate((PLACE_MASKS, TURNED_PLACE_MASKS)):
+            exits = (exit_masks[hands] * can_place)[:, :, np.newaxis] & touching
+            places[..., rotation] = (exits != 0) & (exits & not_facing == 0)
+
+        # action cards
+        kinds = ACTION_KINDS[hands]
+        arguments = slots[:, :, CARD_OFFSET:DISCARD_OFFSET]
+        cells = self._cells
+        placed = (cells & (CELL_OCCUPIED | CELL_START | CELL_GOAL)) == CELL_OCCUPIED
+        arguments |= (kinds == DYNAMITE)[:, :, np.newaxis] & placed[:, np.newaxis, :]
+        face_down = cells[:, GOAL_INDICES] & CELL_REVEALED == 0
+        arguments[:, :, :len(GOAL_INDICES)] |= (kinds == MAP)[:, :, np.newaxis] & face_down[:, np.newaxis, :]
+        broken = (self.broken_tools[:, :, np.newaxis] & _TOOL_BITS) != 0
+        others = np.arange(NUM_PLAYERS) != self.current[:, np.newaxis]
+        whole = (~broken & others[:, :, np.newaxis]).reshape(num_games, 1, NUM_PLAYERS * len(TOOLS))
+        broken = broken.reshape(num_games, 1, NUM_PLAYERS * len(TOOLS))
+        targets = arguments[:, :, :NUM_PLAYERS * len(TOOLS)]
+        targets |= (kinds == SABOTAGE)[:, :, np.newaxis] & whole
+        targets |= (kinds == MEND)[:, :, np.newaxis] & broken
+
+        slots[:, :, DISCARD_OFFSET] = present
+        mask[:, PASS_ACTION] = ~present.any(axis=1)
+        return mask
+
+    def decode_action(self, index, action):
+        """Returns the action tuple (see SaboteurBaseEnvironment.generate_actions) of an action index in one game."""
+        if action == PASS_ACTION:
+            return ('pass',)
+        slot, offset = divmod(int(action), SLOT_ACTIONS)
+        card = CARD_TYPES[self.hands[index, self.current[index], slot]]
+        if offset < CARD_OFFSET:
+            cell, rotation = divmod(offset - PLACE_OFFSET, 2)
+            return ('place', card, cell % BOARD_WIDTH, cell // BOARD_WIDTH, rotation)
+        if offset == DISCARD_OFFSET:
+            return ('discard', card)
+        argument = offset - CARD_OFFSET
+        kind = card.get_action()
+        if kind == 'dynamite':
+            return ('dynamite', card, argument % BOARD_WIDTH, argument // BOARD_WIDTH)
+        if kind == 'map':
+            return ('map', card, argument)
+        target, tool = divmod(argument, len(TOOLS))
+        return (kind, card, target, TOOLS[tool])
+
+    def encode_action(self, index, action):
+        """Returns the action index of an action tuple in one game, using the first hand slot holding its card."""
+        kind = action[0]
+        if kind == 'pass':
+            return PASS_ACTION
+        slot = list(self.hands[index, self.current[index]]).index(action[1].get_type_id())
+        base = slot * SLOT_ACTIONS
+        if kind == 'place':
+            _, _, x, y, rotation = action
+            return base + PLACE_OFFSET + (y * BOARD_WIDTH + x) * 2 + rotation
+        if kind == 'discard':
+            return base + DISCARD_OFFSET
+        if kind == 'dynamite':
+            return base + CARD_OFFSET + action[3] * BOARD_WIDTH + action[2]
+        if kind == 'map':
+            return base + CARD_OFFSET + action[2]
+        return base + CARD_OFFSET + action[2] * len(TOOLS) + TOOLS.index(action[3])
+
+    def step(self, actions):
+        """
+        Plays one legal action index per game. Returns (rewards, done): rewards is a (num_games, NUM_PLAYERS) int8 array
+        with each player's payoff in the games that just ended (1 for the winners, 0 otherwise) and done flags those games.
+        Finished games are reset at once, so every row always holds a game in progress.
+        """
+        num_games = self.num_games
+        actions = np.asarray(actions, dtype=np.intp)
+        games = np.arange(num_games)
+        current = self.current
+        hands = self.hands[games, current]
+        slots, offsets = np.divmod(actions, SLOT_ACTIONS)
+        played = actions != PASS_ACTION
+        slots[~played] = 0
+        cards = hands[games, slots]
+        # like SaboteurBaseEnvironment.apply, the card leaves the hand at its first copy
+        slots = np.argmax(hands == cards[:, np.newaxis], axis=1)
+
+        placing = played & (offsets < CARD_OFFSET)
+        using = played & (offsets >= CARD_OFFSET) & (offsets < DISCARD_OFFSET)
+        arguments = offsets - CARD_OFFSET
+        kinds = np.where(using, ACTION_KINDS[cards], 0)
+
+        rows = np.flatnonzero(placing)
+        if len(rows):
+            cell = offsets[rows] >> 1
+            placed_ids = cards[rows] ^ (offsets[rows] & 1).astype(np.uint8)
+            self._cells[rows, cell] = CELL_CODES[placed_ids]
+            self.card_ids[rows, cell] = placed_ids
+            # only a card a tunnel runs into can connect anything new
+            neighbours = _NEIGHBOUR_CELLS[cell]
+            facing = (_NEIGHBOUR_ON_BOARD[cell]
+                      & (self._cells[rows[:, np.newaxis], neighbours] & CELL_GOAL == 0)
+                      & (self.connected[rows[:, np.newaxis], neighbours] & _OPPOSITE_BITS != 0)
+                      & (EXIT_MASKS[placed_ids][:, np.newaxis] & _EXIT_BITS != 0))
+            rows = rows[facing.any(axis=1)]
+            if len(rows):
+                self._flood(rows)
+
+        rows = np.flatnonzero(kinds == DYNAMITE)
+        if len(rows):
+            cell = arguments[rows]
+            cut = self.connected[rows, cell] != 0
+            self._cells[rows, cell] = 0
+            self.card_ids[rows, cell] = EMPTY_CELL_ID
+            self.connected[rows, cell] = 0
+            # a connected card was blown up: whatever still reaches the start card is flooded again from it
+            rows = rows[cut]
+            if len(rows):
+                self.connected[rows] = 0
+                self.connected[rows, _START_INDEX] = EXIT_MASKS[_START_ID]
+                self._flood(rows)
+
+        rows = np.flatnonzero(kinds == MAP)
+        self.peeked[rows, current[rows]] |= (1 << arguments[rows]).astype(np.uint8)
+
+        rows = np.flatnonzero((kinds == SABOTAGE) | (kinds == MEND))
+        targets, tools = np.divmod(arguments[rows], len(TOOLS))
+        self.broken_tools[rows, targets] = flip_tool(self.broken_tools[rows, targets], _TOOL_BITS[tools])
+
+        # the card leaves the hand, the others close up and a new card, if any, goes at the end
+        rows = np.flatnonzero(played)
+        hands = hands[rows]
+        hands[np.arange(len(rows)), slots[rows]] = EMPTY_SLOT
+        hands = np.take_along_axis(hands, np.argsort(hands == EMPTY_SLOT, axis=1, kind='stable'), axis=1)
+        drawing = self.deck_top[rows] > 0
+        top = self.deck_top[rows] - drawing
+        sizes = (hands != EMPTY_SLOT).sum(axis=1)
+        hands[np.arange(len(rows)), sizes] = np.where(drawing, self.deck[rows, top], EMPTY_SLOT)
+        self.deck_top[rows] = top
+        self.hands[rows, current[rows]] = hands
+
+        self.current = (current + 1) % NUM_PLAYERS
+        done = self.gold_found | (self.hands == EMPTY_SLOT).all(axis=(1, 2))
+        winners = np.where(self.gold_found, _GOLD_DIGGER, _SABOTEUR)
+        rewards = ((self.roles == winners[:, np.newaxis]) & done[:, np.newaxis]).astype(np.int8)
+        if done.any():
+            self.reset(done)
+        return rewards, done
+
+    def _flood(self, rows):
+        # spreads the connected exits of the games in rows until nothing changes: a tunnel enters a neighbour through
+        # its facing exit and reaches the exits joined to it. Goal cards end a tunnel, reached goals are turned
+        # face up and reaching the gold card finds it, as in GameBoard._connect_from
+        cells = self._cells[rows].reshape(-1, BOARD_HEIGHT, BOARD_WIDTH)
+        card_ids = self.card_ids[rows].reshape(cells.shape)
+        connected = self.connected[rows].reshape(cells.shape)
+        extends = (cells & CELL_GOAL) == 0
+        # for every direction, the exits a tunnel entering each card from that side reaches (0 without an exit there)
+        entries = [np.where(cells & direction != 0, direction | LINKS[card_ids, direction], 0).astype(np.uint8)
+                   for direction, _, _, _ in _SHIFTS]
+        while True:
+            reached = connected.copy()
+            for (direction, opposite, cell_slice, neighbour_slice), entry in zip(_SHIFTS, entries):
+                # the cells a tunnel enters from their neighbour that way, through the neighbour's opposite exit
+                leaving = extends[neighbour_slice] & (connected[neighbour_slice] & opposite != 0)
+                reached[cell_slice] |= entry[cell_slice] * leaving
+            if (reached == connected).all():
+                break
+            connected = reached
+        connected = connected.reshape(len(rows), BOARD_CELLS)
+        self.connected[rows] = connected
+        goals = connected[:, GOAL_INDICES] != 0
+        self._cells[rows[:, np.newaxis], GOAL_INDICES] |= np.where(goals, CELL_REVEALED, 0).astype(np.uint8)
+        self.gold_found[rows] |= goals[np.arange(len(rows)), self.gold[rows]]
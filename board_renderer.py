@@ -0,0 +1,67 @@
+import sys
+from os import system, name
+from game_board import BOARD_WIDTH, BOARD_HEIGHT, CELL_REVEALED
+from card import CARD_IMAGES
+
+EMPTY_CELL = ('   ', '   ', '   ')
+
+# ANSI escape sequences
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+MOVE_CURSOR = '\x1b[{0};{1}H'
+
+
+class BoardRenderer():
+    """
+    Draws a GameBoard on a terminal, three text rows per board row and three columns per card.
+    The first frame is written in full, every later frame only rewrites the cells that changed since the
+    previous one, using ANSI cursor movement. Each frame goes out as a single write.
+    """
+
+    def __init__(self, out=None):
+        self._out = out
+        self._last_frame = None
+
+        if name == 'nt':
+            # an empty command turns on ANSI escape sequences in the Windows console
+            system('')
+
+    def reset(self):
+        # forget what is on the screen, e.g. after something else printed over it
+        self._last_frame = None
+
+    def build_frame(self, cards, cells):
+        """Returns the image of every cell, given the cards and the cell codes of the board indexed by y * BOARD_WIDTH + x."""
+        images = CARD_IMAGES
+        # every board card is interned, so its image comes straight from the shared table
+        return [images[(card._type_id << 1) | (cells[idx] & CELL_REVEALED != 0)] if card is not None else EMPTY_CELL
+                for idx, card in enumerate(cards)]
+
+    def render(self, cards, cells):
+        width = BOARD_WIDTH
+        frame = self.build_frame(cards, cells)
+        last_frame = self._last_frame
+        parts = []
+
+        if last_frame is None:
+            parts.append(CLEAR_SCREEN)
+            for y in range(BOARD_HEIGHT):
+                row = frame[y * width:(y + 1) * width]
+                for line in range(3):
+                    parts.append(''.join(image[line] for image in row))
+                    parts.append('\n')
+        else:
+            for idx, image in enumerate(frame):
+                if image is last_frame[idx]:
+                    continue
+                row = (idx // width) * 3 + 1
+                column = (idx % width) * 3 + 1
+                for line in range(3):
+                    parts.append(MOVE_CURSOR.format(row + line, column))
+                    parts.append(image[line])
+            # leave the cursor under the board
+            parts.append(MOVE_CURSOR.format(BOARD_HEIGHT * 3 + 1, 1))
+
+        self._last_frame = frame
+        out = self._out if self._out is not None else sys.stdout
+        out.write(''.join(parts))
+        out.flush()
@@ -1,16 +1,129 @@
+# Exit bits used by the compact board representation (see GameBoard)
+NORTH = 1
+EAST = 2
+SOUTH = 4
+WEST = 8
+EXIT_BITS = (NORTH, EAST, SOUTH, WEST)
+
+
+def exits_to_mask(exits):
+    """Packs an exits list in the order North, East, South, West into a 4-bit mask."""
+    mask = 0
+    for i, is_open in enumerate(exits):
+        if is_open:
+            mask |= EXIT_BITS[i]
+    return mask
+
+
+DIRECTION_BITS = {'north': NORTH, 'east': EAST, 'south': SOUTH, 'west': WEST}
+
+
+def tunnel_components(tunnels):
+    """
+    Groups the exits of a card into the sets joined to each other inside the card, as exit masks.
+    A dead end such as ('south', None) is an exit of its own that leads nowhere.
+    """
+    components = []
+    for tunnel in tunnels:
+        if None in tunnel:
+            continue
+        mask = DIRECTION_BITS[tunnel[0]] | DIRECTION_BITS[tunnel[1]]
+        # merge with every component this tunnel touches
+        for component in list(components):
+            if component & mask:
+                components.remove(component)
+                mask |= component
+        components.append(mask)
+    for tunnel in tunnels:
+        if tunnel[1] is None:
+            bit = DIRECTION_BITS[tunnel[0]]
+            if not any(component & bit for component in components):
+                components.append(bit)
+    return tuple(sorted(components))
+
+
+def turn_exit_mask(mask):
+    """Returns the exit mask of a card rotated by 180 degrees (north <-> south, east <-> west)."""
+    return ((mask << 2) | (mask >> 2)) & 0x0F
+
+
 class Card():
-    pass
+    """
+    Cards are immutable flyweights: every kind of card (and, for path cards, every orientation) is one shared
+    object registered in CARD_TYPES, so a held or placed card is nothing more than a reference to its type.
+    """
+    __slots__ = ()
+
+    def get_type_id(self):
+        return self._type_id
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce_ex__(self, protocol):
+        # interned cards come back as the very same flyweight when unpickled
+        if self._type_id is not None:
+            return (get_card_type, (self._type_id,))
+        return super().__reduce_ex__(protocol)
+
+
+# every interned card, indexed by its type id
+CARD_TYPES = []
+# True while this module builds the cards of the game; afterwards the constructors hand back the interned cards
+_interning = True
+
+
+def get_card_type(type_id):
+    return CARD_TYPES[type_id]
+
+
+def _register(card):
+    card._type_id = len(CARD_TYPES)
+    CARD_TYPES.append(card)
+    if isinstance(card, PathCard):
+        # the first card registered with a shape answers for it, so a cross road comes back as dealt
+        _PATH_SHAPES.setdefault(_shape_key(card._tunnels, card._special_card), card)
+    return card
+
+
+def _shape_key(tunnels, special_card):
+    # special cards are all cross roads, the other path cards are told apart by their set of tunnels
+    if special_card:
+        return special_card
+    return frozenset(tunnel if tunnel[1] is None else tuple(sorted(tunnel)) for tunnel in tunnels)
+
 
 class ActionCard(Card):
+    __slots__ = ('_action', '_type_id')
+
+    def __new__(cls, action):
+        # once the game's cards exist, ActionCard(action) is the shared card, like ActionCard.of(action)
+        if _interning:
+            return super().__new__(cls)
+        if action not in _ACTION_CARDS:
+            raise ValueError("The parameter action must be either map, sabotage, mend or dynamite")
+        return _ACTION_CARDS[action]
 
     def __init__(self, action):
+        if not _interning:
+            return
         assert action in ['map', 'sabotage', 'mend', 'dynamite'], "The parameter action must be either map, sabotage, mend or dynamite"
 
         self._action = action
+        self._type_id = None
     
+    def of(action):
+        # the shared ActionCard for this action
+        return _ACTION_CARDS[action]
+
+    def get_kind(self):
+        return self._action
+
     def get_action(self):
-        self._action
-        return True
+        return self._action
    
     def __str__(self):
         return f"ActionCard({self._action})"
@@ -19,16 +132,41 @@ class InvalidTunnel(Exception):
     pass
 
 
+DIRECTIONS = ('north', 'east', 'south', 'west')
+OPPOSITE_DIRECTION = {
+    'north': 'south',
+    'east': 'west',
+    'west': 'east',
+    'south': 'north',
+}
+
+# special cards are all cross roads
+CROSS_ROAD_TUNNELS = (
+    ('north', 'south'),
+    ('north', 'east'),
+    ('north', 'west'),
+    ('south', 'east'),
+    ('south', 'west'),
+    ('east', 'west')
+)
+
 
 class PathCard(Card):
     """
     A class representing a path card in the Saboteur game.
+    Path cards are interned: the factory methods always return the same shared object for a kind of card,
+    as does the constructor for the tunnels of a card of the game, and the card turned by 180 degrees is a second precomputed object, so turning a card is a lookup.
+    Whether a goal card has been revealed is part of the board, not of the card.
     
     Attributes:
-    - tunnels (list): A list of tuples representing the tunnels in the path card.
+    - tunnels (tuple): A tuple of tuples representing the tunnels in the path card.
     - special_card (str): A string representing the type of special card, if any.
-    - revealed (bool): A boolean indicating whether the card is revealed or not.
-    - exits (list): A list of integers representing the exits of the card in the order North, East, South, West.
+    - exits (tuple): A tuple of integers representing the exits of the card in the order North, East, South, West.
+    - exit_mask (int): The exits packed into 4 bits (see NORTH, EAST, SOUTH, WEST), the ends of all tunnels including dead ends.
+    - components (tuple): The exit masks of the groups of exits joined inside the card.
+    - rotation (int): 0 as dealt, 1 for the card turned by 180 degrees.
+    - kind (str): The name of the kind of card, e.g. 'vertical_tunnel' or 'dead_end_north_south'.
+    - type_id (int): The index of the card in CARD_TYPES.
     
     Methods:
     - cross_road(special_card=None): Returns a PathCard object representing a cross road.
@@ -42,106 +180,153 @@ class PathCard(Card):
     - _is_valid_tunnel(self, tunnel): Returns a boolean indicating whether a given tunnel is valid or not.
     - is_special_card(self): Returns a boolean indicating whether the card is a special card or not.
     - is_gold(self): Returns a boolean indicating whether the card is a gold card or not.
-    - reveal_card(self): Sets the revealed attribute to True.
     - is_open(self, direction): Returns a boolean indicating whether a given direction is open or not.
-    - turn_card(self): Rotates the card by 180 degrees.
+    - turned(self): Returns the card rotated by 180 degrees.
     - get_tunnels(self): Returns a copy of the tunnels attribute.
     """
-class PathCard(Card):
+    __slots__ = ('_tunnels', '_special_card', '_exits', '_exit_mask', '_components', '_links', '_rotation', '_kind', '_type_id', '_turned')
     
-    def __init__(self, tunnels, special_card=None, exits = [0,0,0,0] ):
-        assert isinstance(tunnels, list), "The parameter tunnels must be a list of tuples"
+    def __new__(cls, tunnels, special_card=None, exits=(0, 0, 0, 0), kind=None, rotation=0):
+        # once the game's cards exist, constructing a card looks up the interned card of the same shape
+        if _interning:
+            return super().__new__(cls)
+        card = _PATH_SHAPES.get(_shape_key(tunnels, special_card))
+        if card is None:
+            raise InvalidTunnel("There is no path card with the tunnels {0}".format(list(tunnels)))
+        return card
+
+    def __init__(self, tunnels, special_card=None, exits=(0, 0, 0, 0), kind=None, rotation=0):
+        if not _interning:
+            return
+        assert isinstance(tunnels, (list, tuple)), "The parameter tunnels must be a list of tuples"
         assert special_card in ['start', 'goal', 'gold', None], "The parameter special_card must be either None, start, goal or gold"
 
         self._special_card = special_card
-        self._revealed = True
-        self._exits = exits
+        self._rotation = rotation
+        self._kind = special_card if special_card else kind
+        self._type_id = None
+        self._turned = None
 
         if special_card:
-            # special cards are all cross roads
-            cross_road = PathCard.cross_road()
-            self._tunnels = cross_road.get_tunnels()
-            if special_card in ['goal', 'gold']:
-                self._revealed = False
+            self._tunnels = CROSS_ROAD_TUNNELS
         else:
-            self._tunnels = tunnels
-        
+            self._tunnels = tuple(tunnels)
+
+        # internal connectivity: the groups of exits joined inside the card, and for every exit bit
+        # (indexed by the bit itself) the mask of exits a tunnel entering there can leave by, itself included,
+        # or 0 for a dead end. The exits of the card are exactly the ends of its tunnels, dead ends included
+        self._components = tunnel_components(self._tunnels)
+        links = [0] * (WEST + 1)
+        for component in self._components:
+            if component & (component - 1):
+                for bit in EXIT_BITS:
+                    if component & bit:
+                        links[bit] = component
+        self._links = tuple(links)
+        self._exit_mask = 0
+        for component in self._components:
+            self._exit_mask |= component
+        self._exits = tuple(1 if self._exit_mask & bit else 0 for bit in EXIT_BITS)
         
         for tunnel in tunnels:
             if not self._is_valid_tunnel(tunnel):
                 raise InvalidTunnel("The tunnel '{0}' is an invalid one for this card.".format(tunnel))
+
+    def _build_turned(self):
+        tunnels = []
+        for tunnel in self._tunnels:
+            new_tunnel = (
+                OPPOSITE_DIRECTION[tunnel[0]] if tunnel[0] is not None else None,
+                OPPOSITE_DIRECTION[tunnel[1]] if tunnel[1] is not None else None
+            )
+            tunnels.append(new_tunnel)
         
+        turned = PathCard(tunnels, self._special_card, self._exits[2:] + self._exits[:2], self._kind, 1 - self._rotation) #rotate by 2
+        turned._turned = self
+        self._turned = turned
+        return turned
+
+    def _intern(kind, tunnels, exits=(0, 0, 0, 0), special_card=None):
+        # the shared card for this shape, registered together with its turned counterpart the first time.
+        # Keyed by shape, so dead_end(['east', 'south']) or dead_end(['north']) is the card of the game
+        # with those stubs (dealt or turned), not a new type
+        card = _PATH_SHAPES.get(_shape_key(tunnels, special_card))
+        if card is None:
+            card = _register(PathCard(tunnels, special_card, exits, kind))
+            _register(card._build_turned())
+        return card
             
     def cross_road(special_card=None):
-        return PathCard(
-            [
-                ('north', 'south'),
-                ('north', 'east'),
-                ('north', 'west'),
-                ('south', 'east'),
-                ('south', 'west'),
-                ('east', 'west')
-            ], special_card=special_card,
-            exits = [1,1,1,1] #N E S W
+        return PathCard._intern(
+            special_card if special_card else 'cross_road',
+            CROSS_ROAD_TUNNELS,
+            (1,1,1,1), #N E S W
+            special_card=special_card
         )
     
     def vertical_tunnel():
-        return PathCard(
+        return PathCard._intern(
+            'vertical_tunnel',
             [
                 ('north', 'south')
             ],
-            exits = [1,0,1,0]
+            (1,0,1,0)
         )
     
     def horizontal_tunnel():
-        return PathCard(
+        return PathCard._intern(
+            'horizontal_tunnel',
             [
                 ('east', 'west')
             ], 
-            exits = [0,1,0,1]
+            (0,1,0,1)
         )
     
     def vertical_junction():
-        return PathCard(
+        return PathCard._intern(
+            'vertical_junction',
             [
                 ('north', 'south'),
                 ('north', 'east'),
                 ('south', 'east')
             ],
-            exits = [1,1,1,0]
+            (1,1,1,0)
         )
     
     def horizontal_junction():
-        return PathCard(
+        return PathCard._intern(
+            'horizontal_junction',
             [
                 ('east', 'north'),
                 ('west', 'north'),
                 ('east', 'west')
             ],
-            exits = [1,1,0,1]
+            (1,1,0,1)
         )
     
     def turn():
-        return PathCard(
+        return PathCard._intern(
+            'turn',
             [
                 ('south', 'east')
             ],
-            exits = [0,1,1,0]
+            (0,1,1,0)
         )
     
     def reversed_turn():
-        return PathCard(
+        return PathCard._intern(
+            'reversed_turn',
             [
                 ('south', 'west')
             ],
-            exits = [0,0,1,1]
+            (0,0,1,1)
         )
     
     def dead_end(directions):
         tunnels = []
         for direction in directions:
             tunnels.append((direction, None))
-        return PathCard(tunnels)
+        return PathCard._intern('dead_end_' + '_'.join(directions), tunnels)
     
     
     def _is_valid_tunnel(self, tunnel):
@@ -166,9 +351,6 @@ class PathCard(Card):
     
     def is_gold(self):
         return self._special_card == 'gold'
-    
-    def reveal_card(self):
-        self._revealed = True
         
     def is_open(self, direction):
         for tunnel in self._tunnels:
@@ -176,26 +358,29 @@ class PathCard(Card):
                 return True
         return False
 
-    def turn_card(self):
-        tunnels = []
-        opposite = {
-            'north': 'south',
-            'east': 'west',
-            'west': 'east',
-            'south': 'north',
-        }
-        for tunnel in self._tunnels:
-            new_tunnel = (
-                opposite[tunnel[0]] if tunnel[0] is not None else None,
-                opposite[tunnel[1]] if tunnel[1] is not None else None
-            )
-            tunnels.append(new_tunnel)
-        
-        self._exits = self._exits[2:] + self._exits[:2] #rotate by 2
-        self._tunnels = tunnels
+    def turned(self):
+        if self._turned is None:
+            self._build_turned()
+        return self._turned
         
     def get_tunnels(self):
-        return self._tunnels.copy()
+        return list(self._tunnels)
+
+    def get_exit_mask(self):
+        return self._exit_mask
+
+    def get_rotation(self):
+        return self._rotation
+
+    def get_kind(self):
+        return self._kind
+
+    def get_components(self):
+        return self._components
+
+    def get_links(self, direction_bit):
+        """Returns the mask of exits a tunnel entering by the given exit bit can leave by, or 0 if it is a dead end."""
+        return self._links[direction_bit]
     
     # def __str__(self):
     #     card_rep = ['   ', '   ', '   ']
@@ -225,42 +410,78 @@ class PathCard(Card):
     #         return '   \n ? \n   '
     #     return '\n'.join(card_rep)
 
-    def get_card_image(self):
+    def get_card_image(self, revealed=False):
+        # revealed only matters for goal cards, the board knows whether they have been turned over
+        if self._type_id is None:
+            return self._build_card_image(revealed)
+        return CARD_IMAGES[(self._type_id << 1) | (1 if revealed else 0)]
+
+    def _build_card_image(self, revealed):
         if self._special_card == 'start':
             return ('░█░', '█X█', '░█░')
         
-        if self._special_card in ['gold', 'goal'] and self._revealed == False:
+        if self._special_card in ['gold', 'goal'] and not revealed:
             return ('░█░', '█?█', '░█░')
         
-        if self._special_card == 'gold' and self._revealed == True:
+        if self._special_card == 'gold':
             return ('░█░', '█G█', '░█░')
         
-        if self._special_card == 'goal' and self._revealed == True:
+        if self._special_card == 'goal':
             return ('░█░', '█C█', '░█░')
 
 
-        if self._revealed:
-            directionHashset = set()
-            for tunnels in self._tunnels:
-                directionHashset.add(tunnels[0])
-                directionHashset.add(tunnels[1])
-            
-            top = '░' + ('█' if 'north' in directionHashset else '░') + '░'
-            middle = ('█' if 'west' in directionHashset else '░') + ('░' if None in directionHashset else '█') + ('█' if 'east' in directionHashset else '░')
-            bottom = '░' + ('█' if 'south' in directionHashset else '░') + '░'
-            return (top,middle,bottom)
-        else:
-            return ('   ', '   ', '   ')
+        directionHashset = set()
+        for tunnels in self._tunnels:
+            directionHashset.add(tunnels[0])
+            directionHashset.add(tunnels[1])
+        
+        top = '░' + ('█' if 'north' in directionHashset else '░') + '░'
+        middle = ('█' if 'west' in directionHashset else '░') + ('░' if None in directionHashset else '█') + ('█' if 'east' in directionHashset else '░')
+        bottom = '░' + ('█' if 'south' in directionHashset else '░') + '░'
+        return (top,middle,bottom)
     
     def __str__(self):
-        return "/n".join(self.get_card_image())
+        return "\n".join(self.get_card_image())
 
 class StartingCard(PathCard):
-    def __init__(self):
-        # Initialize with all exits open
-        super().__init__(tunnels=[('north', 'south'), ('east', 'west')], special_card='start')
+    def __new__(cls):
+        # the interned start card, a cross road with all exits open
+        return PathCard.cross_road(special_card='start')
 
 class GoalCard(PathCard):
-    def __init__(self, has_gold):
-        super().__init__(tunnels=[('north', 'south'), ('east', 'west')], special_card='goal' if not has_gold else 'gold')
-        self.has_gold = has_gold  # Whether this card has gold
\ No newline at end of file
+    def __new__(cls, has_gold):
+        # the interned gold card, or the interned plain goal card
+        return PathCard.cross_road(special_card='gold' if has_gold else 'goal')
+
+
+# Intern every card of the game in a fixed order, so type ids are the same in every process
+_PATH_SHAPES = {}
+PathCard.cross_road(special_card='start')
+PathCard.cross_road(special_card='goal')
+PathCard.cross_road(special_card='gold')
+PathCard.vertical_tunnel()
+PathCard.vertical_junction()
+PathCard.cross_road()
+PathCard.horizontal_junction()
+PathCard.horizontal_tunnel()
+PathCard.turn()
+PathCard.reversed_turn()
+for directions in (['south'], ['north','south'], ['north','east','south'], ['north','east','south','west'],
+                   ['west', 'north', 'east'], ['west', 'east'], ['south','east'], ['south','west'], ['west']):
+    PathCard.dead_end(directions)
+
+_ACTION_CARDS = {}
+for action in ['map', 'sabotage', 'mend', 'dynamite']:
+    _ACTION_CARDS[action] = _register(ActionCard(action))
+_interning = False
+
+# the three text rows of every path card, indexed by (type id << 1) | revealed.
+# The type id already tells the orientation apart, the reveal state only changes goal cards
+CARD_IMAGES = []
+for card in CARD_TYPES:
+    if isinstance(card, PathCard):
+        CARD_IMAGES.append(card._build_card_image(False))
+        CARD_IMAGES.append(card._build_card_image(True))
+    else:
+        CARD_IMAGES.extend((None, None))
+del card
@@ -0,0 +1,216 @@
+"""
+Columnar datasets of self-play trajectories: one (observation, action, outcome) row per move.
+
+A dataset is a directory of shards. Every shard holds rows_per_shard rows, one .npy file per column,
+and index.json lists the columns and how many rows each shard holds. Rows are written through memory maps,
+so a writer holds at most the game in progress, and a reader memory-maps the shards and only reads the rows it samples.
+
+    writer = DatasetWriter('data/selfplay')
+    trajectory = Trajectory()
+    ... trajectory.add(env, action) before every env.apply(action) ...
+    writer.write(trajectory.finish(env))
+    writer.close()
+
+    rows = DatasetReader('data/selfplay').sample(1024)
+"""
+import json
+import os
+import numpy as np
+from determinization import ROLES
+from game_board import BOARD_CELLS
+from game_record import encode_move, check_seed, MOVE_SIZE
+from saboteur_base_environment import HAND_SIZE, NUM_PLAYERS, EMPTY_SLOT
+
+# name: (dtype, shape of one row)
+COLUMNS = {
+    'cells': ('u1', (BOARD_CELLS,)),  # the cell codes of the board, see game_board
+    'hand': ('u1', (HAND_SIZE,)),  # type ids of the hand of the player to move, EMPTY_SLOT for empty slots
+    'player': ('u1', ()),  # index of the player to move
+    'role': ('u1', ()),  # index in determinization.ROLES of the role of the player to move
+    'broken_tools': ('u1', (NUM_PLAYERS,)),
+    'action': ('u1', (MOVE_SIZE,)),  # the move, encoded like in game_record
+    'outcome': ('i1', ()),  # 1 if the player to move went on to win the game, else 0
+    'seed': ('u8', ()),  # the game, replayable from its seed (an integer from 0 to game_record.MAX_SEED)
+    'seeded': ('u1', ()),  # 1 if the game was seeded, 0 if it was not and its seed column means nothing
+    'move': ('u2', ()),  # the index of the move in the game
+}
+
+INDEX_FILE = 'index.json'
+
+
+class Trajectory():
+    """The rows of one game in progress. The outcome of every row is only known once the game ends."""
+
+    def __init__(self):
+        self._rows = {name: [] for name in COLUMNS}
+
+    def add(self, env, action):
+        """Adds the row of the player to move in env, who is about to play action."""
+        rows = self._rows
+        if not rows['move'] and env.seed is not None:
+            # a seed the column cannot hold is refused at the first move, not when the game is written
+            check_seed(env.seed)
+        player = env.current_player_index
+        hand = [card.get_type_id() for card in env.get_hand(env.current_player)]
+        rows['cells'].append(bytes(env.board.get_cells()))
+        rows['hand'].append(hand + [EMPTY_SLOT] * (HAND_SIZE - len(hand)))
+        rows['player'].append(player)
+        rows['role'].append(ROLES.index(env.current_player.role))
+        rows['broken_tools'].append(env.get_broken_tool_masks())
+        rows['action'].append(encode_move(action))
+        rows['seed'].append(env.seed if env.seed is not None else 0)
+        rows['seeded'].append(env.seed is not None)
+        rows['move'].append(len(rows['move']))
+
+    def __len__(self):
+        return len(self._rows['move'])
+
+    def finish(self, env):
+        """Returns the rows as column arrays, the outcomes filled in from the winner of the finished game in env."""
+        rows = self._rows
+        winner = ROLES.index(env.get_winner())
+        columns = {}
+        for name, (dtype, shape) in COLUMNS.items():
+            if name == 'outcome':
+                continue
+            values = rows[name]
+            if dtype == 'u1' and shape:
+                column = np.frombuffer(b''.join(bytes(value) for value in values), dtype=np.uint8)
+                columns[name] = column.reshape((len(values),) + shape)
+            else:
+                columns[name] = np.array(values, dtype=dtype)
+        columns['outcome'] = (columns['role'] == winner).astype(np.int8)
+        return columns
+
+
+class DatasetWriter():
+    """Appends rows to the shards of a dataset directory; close() writes the index and trims the last shard."""
+
+    def __init__(self, path, rows_per_shard=65536):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows_per_shard = rows_per_shard
+        self._shards = []
+        self._columns = None
+        self._filled = 0
+        self._closed = False
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            # carry on after the shards already there
+            with open(index_path) as stream:
+                self._shards = json.load(stream)['shards']
+
+    def _shard_file(self, shard, name):
+        return os.path.join(self.path, '{0}.{1}.npy'.format(shard, name))
+
+    def _open_shard(self):
+        shard = 'shard-{0:05d}'.format(len(self._shards))
+        self._shards.append({'name': shard, 'rows': 0})
+        self._columns = {name: np.lib.format.open_memmap(self._shard_file(shard, name), mode='w+', dtype=dtype,
+                                                         shape=(self.rows_per_shard,) + shape)
+                         for name, (dtype, shape) in COLUMNS.items()}
+        self._filled = 0
+
+    def _close_shard(self):
+        shard = self._shards[-1]
+        columns = self._columns
+        self._columns = None
+        for name in COLUMNS:
+            column = columns.pop(name)
+            if self._filled < self.rows_per_shard:
+                # rewrite an unfilled last shard at its real size, one column at a time: the rows are copied out and
+                # the memory map dropped before the trimmed column replaces the file (a mapped file can't be
+                # overwritten on Windows)
+                rows = np.array(column[:self._filled])
+                del column
+                path = self._shard_file(shard['name'], name)
+                with open(path + '.tmp', 'wb') as stream:
+                    np.save(stream, rows)
+                os.replace(path + '.tmp', path)
+            else:
+                column.flush()
+                del column
+        self._write_index()
+
+    def _write_index(self):
+        index = {'columns': {name: [dtype, list(shape)] for name, (dtype, shape) in COLUMNS.items()},
+                 'shards': self._shards}
+        with open(os.path.join(self.path, INDEX_FILE), 'w') as stream:
+            json.dump(index, stream)
+
+    def write(self, columns):
+        """Appends rows given as column arrays, e.g. from Trajectory.finish()."""
+        count = len(columns['move'])
+        start = 0
+        while start < count:
+            if self._columns is None:
+                self._open_shard()
+            take = min(count - start, self.rows_per_shard - self._filled)
+            for name, column in self._columns.items():
+                column[self._filled:self._filled + take] = columns[name][start:start + take]
+            self._filled += take
+            self._shards[-1]['rows'] = self._filled
+            start += take
+            if self._filled == self.rows_per_shard:
+                self._close_shard()
+
+    def close(self):
+        if self._closed:
+            return
+        if self._columns is not None:
+            self._close_shard()
+        else:
+            self._write_index()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DatasetReader():
+    """Reads a dataset directory through memory maps, so sampling only touches the rows it returns."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as stream:
+            index = json.load(stream)
+        self.columns = list(index['columns'])
+        self._shards = [shard for shard in index['shards'] if shard['rows']]
+        self._starts = np.cumsum([0] + [shard['rows'] for shard in self._shards])
+        self._maps = {}
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def _column(self, shard_index, name):
+        key = (shard_index, name)
+        column = self._maps.get(key)
+        if column is None:
+            shard = self._shards[shard_index]
+            column = np.load(os.path.join(self.path, '{0}.{1}.npy'.format(shard['name'], name)), mmap_mode='r')
+            column = column[:shard['rows']]
+            self._maps[key] = column
+        return column
+
+    def get_rows(self, rows, columns=None):
+        """Returns {column: array} for the given global row indices, in that order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = columns or self.columns
+        shard_of = np.searchsorted(self._starts, rows, side='right') - 1
+        result = {}
+        for name in columns:
+            dtype, shape = COLUMNS[name]
+            out = np.empty((len(rows),) + shape, dtype=dtype)
+            for shard_index in np.unique(shard_of):
+                selected = shard_of == shard_index
+                out[selected] = self._column(shard_index, name)[rows[selected] - self._starts[shard_index]]
+            result[name] = out
+        return result
+
+    def sample(self, count, rng=None, columns=None):
+        """Returns count rows drawn uniformly at random (with replacement) with the NumPy generator rng."""
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.get_rows(rng.integers(0, len(self), size=count), columns)
@@ -1,67 +1,123 @@
-from card import PathCard, ActionCard
+from array import array
+from card import PathCard, ActionCard, CARD_TYPES
 import random
 
 class Deck():
-    def __init__(self):
-        self._deck = []
-        self._initialise_deck()
+    """
+    The draw pile. Cards are kept as their type ids in a byte array, the cards still in the deck are
+    _ids[:_top] and the top of the deck is the last of them, so drawing only moves the cursor.
+    """
+    def __init__(self, rng=None):
+        # rng is the random.Random of the game; without one the deck uses the global random module
+        self._rng = rng if rng is not None else random
+        self._ids = array('B', DECK_TEMPLATE)
+        self._top = len(self._ids)
         self.shuffle()
 
-    
-    def _initialise_deck(self):
+    @staticmethod
+    def _initialise_deck():
+        # the type ids of a full, unshuffled deck; built once, see DECK_TEMPLATE
+        cards = []
         for i in range(4):
-            self._deck.append(PathCard.vertical_tunnel())
+            cards.append(PathCard.vertical_tunnel())
         
         for i in range(5):
-            self._deck.append(PathCard.vertical_junction())
+            cards.append(PathCard.vertical_junction())
         
         for i in range(5):
-            self._deck.append(PathCard.cross_road())
+            cards.append(PathCard.cross_road())
         
         for i in range(5):
-            self._deck.append(PathCard.horizontal_junction())
+            cards.append(PathCard.horizontal_junction())
 
         for i in range(3):
-            self._deck.append(PathCard.horizontal_tunnel())
+            cards.append(PathCard.horizontal_tunnel())
         
         for i in range(4):
-            self._deck.append(PathCard.turn())
+            cards.append(PathCard.turn())
         
         for i in range(5):
-            self._deck.append(PathCard.reversed_turn())
+            cards.append(PathCard.reversed_turn())
         
-        self._deck.append(PathCard.dead_end(['south']))
-        self._deck.append(PathCard.dead_end(['north','south']))
-        self._deck.append(PathCard.dead_end(['north','east','south']))
-        self._deck.append(PathCard.dead_end(['north','east','south','west']))
-        self._deck.append(PathCard.dead_end(['west', 'north', 'east']))
-        self._deck.append(PathCard.dead_end(['west', 'east']))
-        self._deck.append(PathCard.dead_end(['south','east']))
-        self._deck.append(PathCard.dead_end(['south','west']))
-        self._deck.append(PathCard.dead_end(['west']))
+        cards.append(PathCard.dead_end(['south']))
+        cards.append(PathCard.dead_end(['north','south']))
+        cards.append(PathCard.dead_end(['north','east','south']))
+        cards.append(PathCard.dead_end(['north','east','south','west']))
+        cards.append(PathCard.dead_end(['west', 'north', 'east']))
+        cards.append(PathCard.dead_end(['west', 'east']))
+        cards.append(PathCard.dead_end(['south','east']))
+        cards.append(PathCard.dead_end(['south','west']))
+        cards.append(PathCard.dead_end(['west']))
 
         for i in range(6):
-            self._deck.append(ActionCard('map'))
+            cards.append(ActionCard.of('map'))
         
         for i in range(9):
-            self._deck.append(ActionCard('sabotage'))
+            cards.append(ActionCard.of('sabotage'))
         
         for i in range(9):
-            self._deck.append(ActionCard('mend'))
+            cards.append(ActionCard.of('mend'))
         
         for i in range(3):
-            self._deck.append(ActionCard('dynamite'))
+            cards.append(ActionCard.of('dynamite'))
+
+        return bytes(card.get_type_id() for card in cards)
+
+    @staticmethod
+    def from_ids(ids, rng=None):
+        # a deck holding exactly these type ids, the top card last, in that order
+        deck = Deck.__new__(Deck)
+        deck._rng = rng if rng is not None else random
+        deck._ids = array('B', ids)
+        deck._top = len(deck._ids)
+        return deck
+
+    def clone(self):
+        # a deck is only a few dozen bytes, copying it is a slice
+        deck = Deck.__new__(Deck)
+        deck._rng = self._rng
+        deck._ids = self._ids[:self._top]
+        deck._top = self._top
+        return deck
 
     def shuffle(self):
-        random.shuffle(self._deck)
+        remaining = self._ids[:self._top]
+        self._rng.shuffle(remaining)
+        self._ids[:self._top] = remaining
+
+    def draw_id(self):
+        """Draws the top card and returns its type id, or None if the deck is empty."""
+        if self._top == 0:
+            return None
+        self._top -= 1
+        return self._ids[self._top]
 
     def draw(self, num_cards=1):
-        if len(self._deck) < num_cards:
-            num_cards = len(self._deck)
+        if self._top < num_cards:
+            num_cards = self._top
             
-        drawn_cards = [self._deck.pop() for _ in range(num_cards)]
+        drawn_cards = [CARD_TYPES[self._ids[self._top - 1 - i]] for i in range(num_cards)]
+        self._top -= num_cards
         return drawn_cards if num_cards > 1 else (drawn_cards[0] if drawn_cards else None)
 
+    def deal(self, num_hands, hand_size):
+        """
+        Deals hand_size cards to each of num_hands hands at once and returns the hands,
+        in the same order as drawing them one card at a time.
+        """
+        hands = []
+        ids = self._ids
+        for _ in range(num_hands):
+            count = min(hand_size, self._top)
+            hands.append([CARD_TYPES[ids[self._top - 1 - i]] for i in range(count)])
+            self._top -= count
+        return hands
+
+    def put_back(self, card):
+        # undoes the last draw of a single card
+        self._ids[self._top] = card.get_type_id()
+        self._top += 1
+
     # def distribute_cards(self, players):
     #     # print(f"Deck before distribution: {self._deck}")
     #     for player in players:
@@ -72,13 +128,23 @@ class Deck():
         
 
     def is_empty(self):
-        return len(self._deck) == 0
+        return self._top == 0
+
+    def __len__(self):
+        return self._top
     
     def get_deck(self):
-        return self._deck
+        # the cards still in the deck, the top one last
+        return [CARD_TYPES[type_id] for type_id in self._ids[:self._top]]
+
+    def get_ids(self):
+        return self._ids[:self._top]
     
     def __str__(self):
         # Return a string representation of the card
         
         return f"Card: {self.attribute}"
 
+
+# every game starts from a copy of this
+DECK_TEMPLATE = Deck._initialise_deck()
@@ -0,0 +1,109 @@
+"""
+Determinizations of a Saboteur game seen from one player: everything that player cannot see
+(the hands of the others, the order of the deck, the roles and where the gold is) is sampled
+consistently with what they can see.
+Cards are handled as their deck type ids and counted in histograms indexed by type id,
+and the samples are written into preallocated NumPy buffers, so thousands of them cost only a few array operations.
+"""
+import numpy as np
+from card import CARD_TYPES
+from deck import DECK_TEMPLATE
+
+ROLES = ('Gold-Digger', 'Saboteur')
+# how many cards of each role there are; one more than the number of players, the last one is left out
+ROLE_POOL = (6, 3)
+
+# the number of copies of every card in a full deck, indexed by type id
+DECK_COUNTS = np.bincount(np.frombuffer(DECK_TEMPLATE, dtype=np.uint8), minlength=len(CARD_TYPES))
+
+
+class Determinizations():
+    """
+    Buffers for num_samples determinizations. The same buffers can be filled again for every decision.
+    - hands[s, p, :hand_sizes[p]] are the type ids of the hand of player p in sample s.
+    - deck[s, :deck_size] are the type ids of the deck in sample s, the top card last like in Deck.
+    - roles[s, p] is the index in ROLES of the role of player p in sample s.
+    - gold[s] is the index of the goal (in the order of the goal locations of the board) holding the gold in sample s.
+    """
+
+    def __init__(self, num_samples, num_players=8, hand_capacity=4):
+        self.num_samples = num_samples
+        self.num_players = num_players
+        self.hands = np.zeros((num_samples, num_players, hand_capacity), dtype=np.uint8)
+        self.hand_sizes = np.zeros(num_players, dtype=np.intp)
+        self.deck = np.zeros((num_samples, len(DECK_TEMPLATE)), dtype=np.uint8)
+        self.deck_size = 0
+        self.roles = np.zeros((num_samples, num_players), dtype=np.uint8)
+        self.gold = np.zeros(num_samples, dtype=np.uint8)
+        # scratch rows the unseen cards and the unassigned roles are shuffled in
+        self._unseen = np.zeros((num_samples, len(DECK_TEMPLATE)), dtype=np.uint8)
+        self._role_pool = np.zeros((num_samples, sum(ROLE_POOL)), dtype=np.uint8)
+
+    def fits(self, num_samples, num_players, hand_capacity):
+        return self.num_samples == num_samples and self.num_players == num_players and self.hands.shape[2] >= hand_capacity
+
+    def get_hand(self, sample, player_index):
+        """Returns the hand of a player in one sample as cards."""
+        return [CARD_TYPES[type_id] for type_id in self.hands[sample, player_index, :self.hand_sizes[player_index]].tolist()]
+
+    def get_deck_ids(self, sample):
+        return self.deck[sample, :self.deck_size]
+
+    def get_role(self, sample, player_index):
+        return ROLES[self.roles[sample, player_index]]
+
+
+def unseen_counts(hand_ids, placed_counts, played_counts, discarded_ids=()):
+    """
+    Returns the histogram of the cards a player has not seen, given the ids of their hand,
+    the cards on the board, the cards played face up and the ids of the cards they discarded face down themselves.
+    """
+    counts = DECK_COUNTS - np.frombuffer(placed_counts, dtype=np.uint8) - np.frombuffer(played_counts, dtype=np.uint8)
+    np.subtract.at(counts, np.asarray(hand_ids, dtype=np.intp), 1)
+    np.subtract.at(counts, np.asarray(discarded_ids, dtype=np.intp), 1)
+    return counts
+
+
+def sample_determinizations(out, rng, player_index, hand_ids, hand_sizes, deck_size, counts, role, gold_candidates):
+    """
+    Fills out with determinizations for the player at player_index, drawn with the NumPy generator rng.
+    The cards of counts (a histogram of the unseen cards) are shuffled and dealt to the other players,
+    in player order, then to the deck; whatever is left over is what the others discarded face down. The other players get
+    their roles from ROLE_POOL without the role of the player, and the gold is one of gold_candidates.
+    """
+    num_samples = out.num_samples
+    num_players = len(hand_sizes)
+    unseen = np.repeat(np.arange(len(counts), dtype=np.uint8), counts)
+    needed = sum(hand_sizes) - hand_sizes[player_index] + deck_size
+    if needed > len(unseen):
+        raise ValueError("{0} unseen cards cannot fill {1} places".format(len(unseen), needed))
+
+    pool = out._unseen[:, :len(unseen)]
+    pool[:] = unseen
+    rng.permuted(pool, axis=1, out=pool)
+
+    out.hand_sizes[:] = hand_sizes
+    out.deck_size = deck_size
+    offset = 0
+    for index in range(num_players):
+        size = hand_sizes[index]
+        if index == player_index:
+            out.hands[:, index, :size] = hand_ids
+        else:
+            out.hands[:, index, :size] = pool[:, offset:offset + size]
+            offset += size
+    out.deck[:, :deck_size] = pool[:, offset:offset + deck_size]
+
+    role_index = ROLES.index(role)
+    remaining_roles = list(ROLE_POOL)
+    remaining_roles[role_index] -= 1
+    roles = out._role_pool[:, :sum(remaining_roles)]
+    roles[:] = np.repeat(np.arange(len(ROLES), dtype=np.uint8), remaining_roles)
+    rng.permuted(roles, axis=1, out=roles)
+    out.roles[:, :player_index] = roles[:, :player_index]
+    out.roles[:, player_index] = role_index
+    out.roles[:, player_index + 1:] = roles[:, player_index:num_players - 1]
+
+    gold_candidates = np.asarray(gold_candidates, dtype=np.uint8)
+    out.gold[:] = gold_candidates[rng.integers(0, len(gold_candidates), size=num_samples)]
+    return out
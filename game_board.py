@@ -1,20 +1,181 @@
 from une_ai.models import GridMap
-from card import PathCard, GoalCard, StartingCard, ActionCard
+from card import PathCard, GoalCard, StartingCard, ActionCard, CARD_TYPES, NORTH, EAST, SOUTH, WEST, turn_exit_mask
+import numpy as np
+import logging
 import random
 import copy   
 from os import system, name
+from zobrist import BOARD_KEYS
+import sys
+
+logger = logging.getLogger(__name__)
+
+BOARD_WIDTH = 20
+BOARD_HEIGHT = 20
+BOARD_CELLS = BOARD_WIDTH * BOARD_HEIGHT
+
+# Every board cell is packed into one byte: the low nibble holds the exit mask
+# of the card (see card.NORTH/EAST/SOUTH/WEST) and the high nibble the flags below
+CELL_EXITS = 0x0F
+CELL_OCCUPIED = 0x10
+CELL_START = 0x20
+CELL_GOAL = 0x40  # goal or gold card
+CELL_REVEALED = 0x80
+
+OPPOSITE_EXIT = {NORTH: SOUTH, EAST: WEST, SOUTH: NORTH, WEST: EAST}
+
+# the card type id of an empty cell in GameBoard.get_state()
+EMPTY_CELL_ID = 0xFF
+
+# entries kept in the change log of a board before it is cut back (see GameBoard.get_changes)
+CHANGE_LOG_LIMIT = 4096
+
+
+def _build_neighbours():
+    # for each cell index, the (exit, neighbour index) pairs that stay on the board
+    neighbours = []
+    for idx in range(BOARD_CELLS):
+        x, y = idx % BOARD_WIDTH, idx // BOARD_WIDTH
+        cell_neighbours = []
+        if y > 0:
+            cell_neighbours.append((NORTH, idx - BOARD_WIDTH))
+        if x < BOARD_WIDTH - 1:
+            cell_neighbours.append((EAST, idx + 1))
+        if y < BOARD_HEIGHT - 1:
+            cell_neighbours.append((SOUTH, idx + BOARD_WIDTH))
+        if x > 0:
+            cell_neighbours.append((WEST, idx - 1))
+        neighbours.append(tuple(cell_neighbours))
+    return tuple(neighbours)
+
+NEIGHBOURS = _build_neighbours()
+
+
+# The requirement byte cached for every empty cell: the low nibble marks the sides that touch
+# the start card or a path card, the high nibble the subset of those whose card has an exit facing the cell
+REQUIRE_TOUCHING = 0x0F
+
+# bits of a PLACEMENT_FITS entry
+PLACE_AS_IS = 1
+PLACE_TURNED = 2
+
+
+def _exits_fit(exit_mask, requirement):
+    # same rule as check_path_card always had: at least one of our exits runs into a card,
+    # and every card our exits run into has an exit facing back
+    touching = exit_mask & requirement & REQUIRE_TOUCHING
+    return touching != 0 and touching & ~(requirement >> 4) == 0
+
+
+def _build_placement_fits():
+    # indexed by (exit mask << 8) | requirement, answers both orientations at once
+    fits = bytearray(16 * 256)
+    for exit_mask in range(16):
+        for requirement in range(256):
+            entry = 0
+            if _exits_fit(exit_mask, requirement):
+                entry |= PLACE_AS_IS
+            if _exits_fit(turn_exit_mask(exit_mask), requirement):
+                entry |= PLACE_TURNED
+            fits[(exit_mask << 8) | requirement] = entry
+    return fits
+
+PLACEMENT_FITS = _build_placement_fits()
+PLACEMENT_FITS_ARRAY = np.frombuffer(bytes(PLACEMENT_FITS), dtype=np.uint8)
+
+
+def requirement_grid(cells):
+    """
+    Returns the requirement byte of every cell (see GameBoard._update_frontier) for a uint8 array of cell codes
+    shaped (..., BOARD_HEIGHT, BOARD_WIDTH), as a uint16 array of the same shape.
+    The requirement of each cell is rebuilt by shifting the board one step in each direction.
+    """
+    cells = np.asarray(cells, dtype=np.uint8)
+    connecting = (cells & CELL_OCCUPIED != 0) & (cells & CELL_GOAL == 0)
+    requirement = np.zeros(cells.shape, dtype=np.uint16)
+
+    # (direction, slice of the cells that have a neighbour that way, slice of those neighbours)
+    shifts = (
+        (NORTH, np.s_[..., 1:, :], np.s_[..., :-1, :]),
+        (SOUTH, np.s_[..., :-1, :], np.s_[..., 1:, :]),
+        (EAST, np.s_[..., :, :-1], np.s_[..., :, 1:]),
+        (WEST, np.s_[..., :, 1:], np.s_[..., :, :-1]),
+    )
+    for direction, cell_slice, neighbour_slice in shifts:
+        touching = connecting[neighbour_slice]
+        facing = touching & (cells[neighbour_slice] & OPPOSITE_EXIT[direction] != 0)
+        requirement[cell_slice] |= touching * np.uint16(direction) | facing * np.uint16(direction << 4)
+    requirement[cells & CELL_OCCUPIED != 0] = 0
+    return requirement
+
+
+def placement_grid(cells, exit_masks):
+    """
+    Vectorized counterpart of GameBoard.get_placements for many cards at once.
+    Takes a uint8 array of cell codes shaped (..., BOARD_HEIGHT, BOARD_WIDTH), e.g. GameBoard.get_cell_grid()
+    or a stack of boards, and a sequence of K exit masks. Returns a uint8 array shaped (..., K, BOARD_HEIGHT, BOARD_WIDTH)
+    holding the PLACE_AS_IS / PLACE_TURNED bits of every card on every cell.
+    """
+    requirement = requirement_grid(cells)
+    keys = np.asarray(exit_masks, dtype=np.uint16).reshape(-1, 1, 1) << 8
+    return PLACEMENT_FITS_ARRAY[keys | requirement[..., np.newaxis, :, :]]
+
+
+GOAL_CARD = PathCard.cross_road(special_card='goal')
+
+
+def cell_code(card):
+    """Returns the byte stored on the board for the given PathCard."""
+    code = card._exit_mask | CELL_OCCUPIED
+    if card._special_card == 'start':
+        code |= CELL_START
+    elif card._special_card in ['goal', 'gold']:
+        # goal cards always go on the board face down
+        code |= CELL_GOAL
+    return code
 
-class GameBoard():
 
-    def __init__(self, start_x=6, start_y=10):
+class GameBoard():
 
-        self._board = GridMap(20, 20, None)
+    def __init__(self, start_x=6, start_y=10, headless=False, rng=None):
+        # rng is the random.Random of the game, it picks the gold card; without one the global random module does
+
+        # compact board: one byte per cell (exit mask + flags), indexed by y * BOARD_WIDTH + x.
+        # The PathCard objects are kept alongside only to render the board and hand them back to callers
+        self._cells = bytearray(BOARD_CELLS)
+        self._cards = [None] * BOARD_CELLS
+        # empty cells next to the start card or a path card, the only places a card can ever go,
+        # together with the requirement byte of every cell (0 for occupied cells, so nothing fits there)
+        self._frontier = set()
+        self._requirements = bytearray(BOARD_CELLS)
+        # for every card, the mask of its exits a tunnel from the start card reaches (0 if none).
+        # Tunnels are followed through the internal connectivity of each card, so dead ends stop them
+        self._connected = bytearray(BOARD_CELLS)
+        self._gold_found = False
+        # Zobrist hash of the cards on the board, kept up to date on every cell change
+        self._hash = 0
+        # how many copies of each deck card lie on the board, indexed by the type id of the card as it
+        # comes out of the deck (its rotation 0 id); start and goal cards are not counted
+        self._placed_counts = bytearray(len(CARD_TYPES))
+        # indices of the cells holding one of those cards, the targets of a dynamite
+        self._placed = set()
+        # the cells whose code or reached exits changed, in order (None for the whole board), for observers
+        # that follow the board incrementally; cut back after CHANGE_LOG_LIMIT entries, which starts a new epoch.
+        # Nothing is logged until the first get_changes call, so boards nobody observes pay nothing for it
+        self._changes = []
+        self._changes_epoch = 0
+        self._logging = False
+        # created on the first draw_board call; a headless board never draws anything
+        self._renderer = None
+        self._headless = headless
+        self.start_x = start_x
+        self.start_y = start_y
         
         start_card = PathCard.cross_road(special_card='start')
         goal_cards = []
         self._goal_cards = goal_cards
 
-        gold_idx = random.choice([0,1,2])
+        gold_idx = (rng if rng is not None else random).choice([0,1,2])
         for i in range(3):
             if gold_idx == i:
               label = 'gold'
@@ -22,15 +183,224 @@ class GameBoard():
                 label = 'goal'
             goal_cards.append(PathCard.cross_road(special_card=label))
        
-        self._board.set_item_value(start_x, start_y, start_card)
+        self._set_card(start_x, start_y, start_card)
         goal_locations = [(14,8),(14,10), (14,12)]
+        self._goal_locations = goal_locations
         
         for i, goal in enumerate(goal_cards):
-            self._board.set_item_value(goal_locations[i][0], goal_locations[i][1], goal)
-    
+            self._set_card(goal_locations[i][0], goal_locations[i][1], goal)
+        self._start_idx = start_y * BOARD_WIDTH + start_x
+        self._update_frontier(self._start_idx)
+        self._connected[self._start_idx] = start_card._exit_mask
+
+    def clone(self):
+        """
+        Returns an independent copy of the board state. Only the flat arrays and sets are copied,
+        the cards are shared flyweights and the goal cards and locations never change after setup.
+        The clone gets its own renderer the first time it is drawn.
+        """
+        board = GameBoard.__new__(GameBoard)
+        board._cells = self._cells[:]
+        board._cards = self._cards[:]
+        board._frontier = set(self._frontier)
+        board._requirements = self._requirements[:]
+        board._connected = self._connected[:]
+        board._gold_found = self._gold_found
+        board._hash = self._hash
+        board._placed_counts = self._placed_counts[:]
+        board._placed = set(self._placed)
+        board._changes = []
+        board._changes_epoch = 0
+        board._logging = False
+        board._renderer = None
+        board._headless = self._headless
+        board.start_x = self.start_x
+        board.start_y = self.start_y
+        board._goal_cards = self._goal_cards
+        board._goal_locations = self._goal_locations
+        board._start_idx = self._start_idx
+        return board
+
+    def get_state(self):
+        """
+        Returns the board as immutable values: the cell codes, the type id of the card in each cell (EMPTY_CELL_ID if none),
+        the requirement bytes, the reached exits of each cell, whether the gold was found and the hash.
+        from_state rebuilds the board from them.
+        """
+        card_ids = bytes(card._type_id if card is not None else EMPTY_CELL_ID for card in self._cards)
+        return (bytes(self._cells), card_ids, bytes(self._requirements), bytes(self._connected), self._gold_found, self._hash)
+
+    @staticmethod
+    def from_state(cells, card_ids, requirements, connected, gold_found, board_hash, headless=True):
+        # the inverse of get_state; the frontier, the placed cards and the goals are read back from the arrays
+        board = GameBoard.__new__(GameBoard)
+        board._cells = bytearray(cells)
+        board._cards = [CARD_TYPES[type_id] if type_id != EMPTY_CELL_ID else None for type_id in card_ids]
+        board._requirements = bytearray(requirements)
+        board._frontier = {idx for idx, requirement in enumerate(requirements) if requirement}
+        board._connected = bytearray(connected)
+        board._gold_found = gold_found
+        board._hash = board_hash
+        board._placed_counts = bytearray(len(CARD_TYPES))
+        board._placed = set()
+        board._changes = []
+        board._changes_epoch = 0
+        board._logging = False
+        board._goal_locations = [(14,8),(14,10), (14,12)]
+        board._goal_cards = [board._cards[y * BOARD_WIDTH + x] for x, y in board._goal_locations]
+        for idx, card in enumerate(board._cards):
+            if card is None:
+                continue
+            if card._special_card is None:
+                board._placed_counts[card._type_id & ~1] += 1
+                board._placed.add(idx)
+            elif card._special_card == 'start':
+                board._start_idx = idx
+        board.start_x = board._start_idx % BOARD_WIDTH
+        board.start_y = board._start_idx // BOARD_WIDTH
+        board._renderer = None
+        board._headless = headless
+        return board
+
+    def _set_card(self, x, y, card):
+        idx = y * BOARD_WIDTH + x
+        self._hash ^= self._cell_key(idx)
+        previous = self._cards[idx]
+        if previous is not None and previous._special_card is None:
+            self._placed_counts[previous._type_id & ~1] -= 1
+            self._placed.discard(idx)
+        if card is not None and card._special_card is None:
+            self._placed_counts[card._type_id & ~1] += 1
+            self._placed.add(idx)
+        self._cards[idx] = card
+        self._cells[idx] = cell_code(card) if card is not None else 0
+        self._hash ^= self._cell_key(idx)
+        self._log_changes((idx,))
+
+    def _log_changes(self, cells):
+        # every entry of the change log goes through here
+        if not self._logging:
+            return
+        changes = self._changes
+        changes.extend(cells)
+        if len(changes) > CHANGE_LOG_LIMIT:
+            changes.clear()
+            self._changes_epoch += 1
+
+    def _cell_key(self, idx):
+        # the key covers the cell, the card type (which fixes its exits and orientation) and the reveal state.
+        # Goal cards are keyed as plain goals until revealed, so the hash never leaks where the gold is
+        code = self._cells[idx]
+        if not code & CELL_OCCUPIED:
+            return 0
+        card = self._cards[idx]
+        reveal_state = 0
+        if code & CELL_GOAL:
+            if code & CELL_REVEALED:
+                reveal_state = 1
+            else:
+                card = GOAL_CARD
+        return BOARD_KEYS[(idx << 8) | (card._type_id << 2) | reveal_state]
+
+    def get_hash(self):
+        """Returns the 64-bit Zobrist hash of the board."""
+        return self._hash
+
+    def get_placed_counts(self):
+        """Returns how many copies of each deck card are on the board, indexed by the type id the card has in the deck."""
+        return self._placed_counts
+
+    def _update_frontier(self, idx):
+        # only the changed cell and its neighbours can change their requirement or enter/leave the frontier
+        cells = self._cells
+        requirements = self._requirements
+        frontier = self._frontier
+        for cell_idx in (idx,) + tuple(neighbour_idx for _, neighbour_idx in NEIGHBOURS[idx]):
+            requirement = 0
+            if not cells[cell_idx] & CELL_OCCUPIED:
+                for direction, neighbour_idx in NEIGHBOURS[cell_idx]:
+                    code = cells[neighbour_idx]
+                    if code & CELL_OCCUPIED and not code & CELL_GOAL:
+                        requirement |= direction
+                        if code & OPPOSITE_EXIT[direction]:
+                            requirement |= direction << 4
+            requirements[cell_idx] = requirement
+            if requirement:
+                frontier.add(cell_idx)
+            else:
+                frontier.discard(cell_idx)
+
+    def get_changes(self, epoch, position):
+        """
+        Returns (epoch, position, cells): the cells changed since position in the change log of the given epoch
+        and the epoch and position to ask from next time. The requirement of a cell can also change with its neighbours.
+        cells is None when the whole board has to be read again: the log was cut back since, or a dynamite
+        cut the tunnel network. The first call always returns None, as the board starts logging its changes then.
+        """
+        if not self._logging:
+            self._logging = True
+            self._changes_epoch += 1
+        changes = self._changes
+        if epoch != self._changes_epoch or position > len(changes):
+            return (self._changes_epoch, len(changes), None)
+        cells = changes[position:]
+        if None in cells:
+            cells = None
+        return (epoch, len(changes), cells)
+
+    def get_frontier(self):
+        """Returns the (x, y) coordinates of the empty cells next to the start card or a path card, sorted by x then y."""
+        return sorted(((idx % BOARD_WIDTH, idx // BOARD_WIDTH) for idx in self._frontier))
+
+    def get_placed_cells(self):
+        """Returns the (x, y) coordinates of the path cards on the board (start and goal cards excluded), sorted by x then y."""
+        return sorted(((idx % BOARD_WIDTH, idx // BOARD_WIDTH) for idx in self._placed))
+
+    def get_placement_options(self, x, y, exit_mask):
+        """Returns the PLACEMENT_FITS entry for a card with the given exit mask at (x, y): PLACE_AS_IS and/or PLACE_TURNED."""
+        return PLACEMENT_FITS[(exit_mask << 8) | self._requirements[y * BOARD_WIDTH + x]]
+
+    def get_placements(self, exit_mask, frontier=None):
+        """Returns every (x, y, rotation) a card with the given exit mask can be placed at, rotation 1 meaning turned."""
+        if frontier is None:
+            frontier = self.get_frontier()
+        requirements = self._requirements
+        key = exit_mask << 8
+        placements = []
+        for x, y in frontier:
+            fits = PLACEMENT_FITS[key | requirements[y * BOARD_WIDTH + x]]
+            if fits & PLACE_AS_IS:
+                placements.append((x, y, 0))
+            if fits & PLACE_TURNED:
+                placements.append((x, y, 1))
+        return placements
    
     def get_board(self):
-            return self._board.get_map()
+            return self.get_grid_map().get_map()
+
+    def get_cells(self):
+        """Returns the compact board, one byte per cell indexed by y * BOARD_WIDTH + x."""
+        return self._cells
+
+    def get_cell_grid(self):
+        """Returns a (BOARD_HEIGHT, BOARD_WIDTH) uint8 NumPy view of the compact board, sharing its memory."""
+        return np.frombuffer(self._cells, dtype=np.uint8).reshape(BOARD_HEIGHT, BOARD_WIDTH)
+
+    def get_connected(self):
+        """
+        Returns a read-only view of the mask of exits a tunnel from the start card reaches, one byte per cell.
+        Removing a card can replace the bytes behind it, so take a fresh view after every change to the board.
+        """
+        return memoryview(self._connected).toreadonly()
+
+    def get_requirements(self):
+        """Returns a read-only view of the requirement byte of every cell (0 where nothing fits), one byte per cell."""
+        return memoryview(self._requirements).toreadonly()
+
+    def get_cell(self, x, y):
+        if x < 0 or y < 0 or x >= BOARD_WIDTH or y >= BOARD_HEIGHT:
+            return 0
+        return self._cells[y * BOARD_WIDTH + x]
 
     # Check if path card is good!
     # TODO make sure that when we check for valid cards, we make sure that we have at least one non-special goal card
@@ -40,51 +410,8 @@ class GameBoard():
         assert x >= 0 and x < 20, "The x coordinate must be 0 <= x < 20"
         assert y >= 0 and y < 20, "The y coordinate must be 0 <= y < 20"
 
-        if self._board.get_item_value(x,y) is not None:
-            return False
-        
-        hasOne = False
-        valid = True
-
-        top = None
-        right = None
-        left = None
-        bottom = None
-
-        if y > 0 and path_card._exits[0] == 1:
-            top = self._board.get_item_value(x, y-1)
-
-        if y < 19 and path_card._exits[2] == 1:
-            bottom = self._board.get_item_value(x, y + 1)
-
-        if x > 0 and path_card._exits[3] == 1:
-            left = self._board.get_item_value(x-1, y)
-
-        if x < 19 and path_card._exits[1] == 1:
-            right = self._board.get_item_value(x+1, y)
-        
-
-        if top is not None and top._special_card in ['start', None]:
-            hasOne = True
-            valid = top._exits[2] == 1
-        
-        if bottom is not None and bottom._special_card in ['start', None]:
-            hasOne = True
-            valid = valid and bottom._exits[0] == 1
-
-        if left is not None and left._special_card in ['start', None]:
-            hasOne = True
-            valid = valid and left._exits[1] == 1
-
-        if right is not None and right._special_card in ['start', None]:
-            hasOne = True
-            valid = valid and right._exits[3] == 1
-
-        
-        if hasOne and valid:
-            return True
-        else:
-            return False
+        # occupied cells have a requirement of 0, which no card fits
+        return PLACEMENT_FITS[(path_card._exit_mask << 8) | self._requirements[y * BOARD_WIDTH + x]] & PLACE_AS_IS != 0
       
 
     # This method does check if there is a valid path from
@@ -94,51 +421,195 @@ class GameBoard():
         assert isinstance(path_card, PathCard), "The parameter path_card must be an instance of the class PathCard"
         assert x >= 0 and x < 20, "The x coordinate must be 0 <= x < 20"
         assert y >= 0 and y < 20, "The y coordinate must be 0 <= y < 20"
-        assert self._board.get_item_value(x, y) is None, "There is already another card on the board at coordinates ({0}, {1})".format(x, y)
+        idx = y * BOARD_WIDTH + x
+        assert not self._cells[idx] & CELL_OCCUPIED, "There is already another card on the board at coordinates ({0}, {1})".format(x, y)
 
         # We can do another check here, but we'll rely on the program to do it for
-        self._board.set_item_value(x, y, path_card)
-
-        # check if we're next to any of the goal cards and reveal them!
-        # we must have a valid tunnel to this goal card, otherwise we don't flip it, since we never actually dug into it
-
-        top = None
-        right = None
-        left = None
-        bottom = None
-
-
-        if y > 0 and path_card._exits[0] == 1:
-            top = self._board.get_item_value(x, y-1)
-
-        if y < 19 and path_card._exits[2] == 1:
-            bottom = self._board.get_item_value(x, y + 1)
-
-        if x > 0 and path_card._exits[3] == 1:
-            left = self._board.get_item_value(x-1, y)
-
-        if x < 19 and path_card._exits[1] == 1:
-            right = self._board.get_item_value(x+1, y)
-        
-        if top is not None and top._special_card in ['goal', 'gold']:
-            top.reveal_card()
-        
-        if bottom is not None and bottom._special_card in ['goal', 'gold']:
-            bottom.reveal_card()
-
-        if left is not None and left._special_card in ['goal', 'gold']:
-            left.reveal_card()
-
-        if right is not None and right._special_card in ['goal', 'gold']:
-            right.reveal_card()
+        self._set_card(x, y, path_card)
+        self._update_frontier(idx)
+
+        # if the new card digs into the tunnel, everything it joins becomes connected to the start card,
+        # and any goal card we actually dug into is revealed on the way.
+        # The cells connected and revealed here are returned so undo_add_path_card can take them back
+        cells = self._cells
+        connected = self._connected
+        exit_mask = path_card._exit_mask
+        links = path_card._links
+        reached = 0
+        for direction, neighbour_idx in NEIGHBOURS[idx]:
+            if exit_mask & direction and not cells[neighbour_idx] & CELL_GOAL and connected[neighbour_idx] & OPPOSITE_EXIT[direction]:
+                reached |= direction | links[direction]
+        if reached:
+            return self._connect_from(idx, reached)
+        return ((), ())
+
+    def undo_add_path_card(self, x, y, change):
+        """Takes back add_path_card(x, y, ...), given the change it returned."""
+        changed, revealed = change
+        idx = y * BOARD_WIDTH + x
+        self._set_card(x, y, None)
+        self._update_frontier(idx)
+        connected = self._connected
+        for cell_idx, previous in reversed(changed):
+            connected[cell_idx] = previous
+            if not previous and self._cells[cell_idx] & CELL_GOAL and self._cards[cell_idx].is_gold():
+                self._gold_found = False
+        connected[idx] = 0
+        for cell_idx in revealed:
+            self._hash ^= self._cell_key(cell_idx)
+            self._cells[cell_idx] &= ~CELL_REVEALED
+            self._hash ^= self._cell_key(cell_idx)
+        self._log_changes(cell_idx for cell_idx, _ in changed)
 
       
     def remove_path_card(self, x, y):
         assert x >= 0 and x < 20, "The x coordinate must be 0 <= x < 20"
         assert y >= 0 and y < 20, "The y coordinate must be 0 <= y < 20"
-        assert self._board.get_item_value(x, y) is not None and not self._board.get_item_value(x, y).is_special_card(), "There is no valid card to remove at coordinates ({0}, {1})".format(x, y)
+        code = self._cells[y * BOARD_WIDTH + x]
+        assert code & CELL_OCCUPIED and not code & (CELL_START | CELL_GOAL), "There is no valid card to remove at coordinates ({0}, {1})".format(x, y)
+
+        # returns what undo_remove_path_card needs: the card and, if the tunnel was cut, the old connected flags
+        idx = y * BOARD_WIDTH + x
+        card = self._cards[idx]
+        previous_connected = None
+        self._set_card(x, y, None)
+        self._update_frontier(idx)
+        if self._connected[idx]:
+            # _reconnect builds a fresh array, so the old one is kept untouched for the undo
+            previous_connected = self._connected
+            self._reconnect()
+            self._log_changes((None,))
+        return (card, previous_connected)
+
+    def undo_remove_path_card(self, x, y, change):
+        """Puts back the card taken by remove_path_card(x, y), given the change it returned."""
+        card, previous_connected = change
+        idx = y * BOARD_WIDTH + x
+        self._set_card(x, y, card)
+        self._update_frontier(idx)
+        if previous_connected is not None:
+            self._connected = previous_connected
+            self._log_changes((None,))
+
+    def _connect_from(self, idx, reached):
+        # flood outwards from a card whose exits in reached just got connected, entering every neighbour
+        # through its facing exit and leaving only by the exits joined to it; goal cards end a tunnel, they never extend it.
+        # Returns the (cell, previous mask) pairs it changed and the goal cards it revealed
+        cells = self._cells
+        cards = self._cards
+        connected = self._connected
+        changed = [(idx, connected[idx])]
+        connected[idx] |= reached
+        revealed = []
+        stack = [idx]
+        while stack:
+            current = stack.pop()
+            if cells[current] & CELL_GOAL:
+                continue
+            reached = connected[current]
+            for direction, neighbour_idx in NEIGHBOURS[current]:
+                if not reached & direction:
+                    continue
+                neighbour = cells[neighbour_idx]
+                opposite = OPPOSITE_EXIT[direction]
+                if not neighbour & opposite:
+                    continue
+                previous = connected[neighbour_idx]
+                entering = previous | opposite | cards[neighbour_idx]._links[opposite]
+                if entering == previous:
+                    continue
+                changed.append((neighbour_idx, previous))
+                connected[neighbour_idx] = entering
+                if neighbour & CELL_GOAL and not previous:
+                    if not neighbour & CELL_REVEALED:
+                        self._reveal(neighbour_idx)
+                        revealed.append(neighbour_idx)
+                    if cards[neighbour_idx].is_gold():
+                        self._gold_found = True
+                stack.append(neighbour_idx)
+        self._log_changes(cell_idx for cell_idx, _ in changed)
+        return (changed, revealed)
+
+    def _reconnect(self):
+        # after a card is blown up only the cards that were connected before can still be,
+        # so the flood is limited to that tunnel network instead of the whole board
+        cells = self._cells
+        cards = self._cards
+        connected = self._connected
+        still_connected = bytearray(BOARD_CELLS)
+        still_connected[self._start_idx] = connected[self._start_idx]
+        stack = [self._start_idx]
+        while stack:
+            current = stack.pop()
+            if cells[current] & CELL_GOAL:
+                continue
+            reached = still_connected[current]
+            for direction, neighbour_idx in NEIGHBOURS[current]:
+                if not reached & direction or not connected[neighbour_idx]:
+                    continue
+                opposite = OPPOSITE_EXIT[direction]
+                if not cells[neighbour_idx] & opposite:
+                    continue
+                previous = still_connected[neighbour_idx]
+                entering = previous | opposite | cards[neighbour_idx]._links[opposite]
+                if entering != previous:
+                    still_connected[neighbour_idx] = entering
+                    stack.append(neighbour_idx)
+        self._connected = still_connected
+
+    def _reveal(self, idx):
+        self._hash ^= self._cell_key(idx)
+        self._cells[idx] |= CELL_REVEALED
+        self._hash ^= self._cell_key(idx)
+        self._log_changes((idx,))
+
+    def reveal_card(self, x, y):
+        """Turns the goal card at (x, y) face up. Returns True if it was hidden until now."""
+        idx = y * BOARD_WIDTH + x
+        code = self._cells[idx]
+        assert code & CELL_GOAL, "There is no goal card at coordinates ({0}, {1})".format(x, y)
+        if code & CELL_REVEALED:
+            return False
+        self._reveal(idx)
+        return True
 
-        self._board.set_item_value(x, y, None)
+    def is_revealed(self, x, y):
+        """Returns True if the goal card at (x, y) has been turned face up."""
+        return self.get_cell(x, y) & CELL_REVEALED != 0
+
+    def get_goal_locations(self):
+        return self._goal_locations
+
+    def get_gold_candidates(self, peeked=0):
+        """
+        Returns the indices (in goal location order) of the goals that may hold the gold as far as a player can tell:
+        the revealed gold card if there is one, otherwise every goal still face down.
+        peeked is the bitmask (bit i for goal i) of the goals the player has looked at with a map card.
+        """
+        candidates = []
+        for index, (x, y) in enumerate(self._goal_locations):
+            if self.is_revealed(x, y) or peeked & (1 << index):
+                if self._goal_cards[index].is_gold():
+                    return [index]
+            else:
+                candidates.append(index)
+        return candidates
+
+    def is_connected(self, x, y):
+        """Returns True if the card at (x, y) is joined to the start card by a tunnel."""
+        if x < 0 or y < 0 or x >= BOARD_WIDTH or y >= BOARD_HEIGHT:
+            return False
+        return self._connected[y * BOARD_WIDTH + x] != 0
+
+    def get_reached_exits(self, x, y):
+        """Returns the mask of the exits of the card at (x, y) that a tunnel from the start card reaches."""
+        if x < 0 or y < 0 or x >= BOARD_WIDTH or y >= BOARD_HEIGHT:
+            return 0
+        return self._connected[y * BOARD_WIDTH + x]
+
+    def gold_found(self):
+        """Returns True once a tunnel from the start card has reached the gold card."""
+        return self._gold_found
 
 
     def clear(self):    
@@ -146,95 +617,57 @@ class GameBoard():
         if name == 'nt':
             _ = system('cls')
     
-        # for mac and linux(here, os.name is 'posix')
+        # for mac and linux(here, os.name is 'posix') an escape sequence does it without starting a shell
         else:
-            _ = system('clear')
+            from board_renderer import CLEAR_SCREEN
+            sys.stdout.write(CLEAR_SCREEN)
+        if self._renderer is not None:
+            self._renderer.reset()
 
     def draw_board_numbers(self):
+        if self._headless:
+            return
         self.clear()
 
-        for y in range(self._board.get_height()):
+        lines = []
+        for y in range(BOARD_HEIGHT):
 
             #top
-            for x in range(self._board.get_width()):
-                print(f'{x}'.ljust(3, ' '), end='')
-            print('')
-            
+            lines.append(''.join(f'{x}'.ljust(3, ' ') for x in range(BOARD_WIDTH)))
             #middle
-            for x in range(self._board.get_width()):
-                print('   ', end='')
-            print('')
-
+            lines.append('   ' * BOARD_WIDTH)
             #bottom
-            for x in range(self._board.get_width()):
-                print(f'{y}'.ljust(3, ' '), end='')
-            print('')
-
-
-    def draw_board(self):
-        self.clear()
+            lines.append(f'{y}'.ljust(3, ' ') * BOARD_WIDTH)
 
-        # for y in range(self._board.get_height()):
-        #     for x in range(self._board.get_width()):
-        #         card = self._board.get_item_value(x,y)
-        #         # make sure its not None (the default)
-        #         if card is not None:
-        #             print('█', end='')
-        #         else:
-        #             print(' ', end='')
-                
-        #     print('')
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
 
 
-        for y in range(self._board.get_height()):
-
-            #top
-            for x in range(self._board.get_width()):
-                # get the card at this x,y postion
-                card = self._board.get_item_value(x,y)
-                # make sure its not None (the default)
-                if card is not None:
-                    top,middle,bottom = card.get_card_image()
-                    print(top, end='')
-                else:
-                    print('   ', end='')
-            print('')
-            
-            #middle
-            for x in range(self._board.get_width()):
-                # get the card at this x,y postion
-                card = self._board.get_item_value(x,y)
-                # make sure its not None (the default)
-                if card is not None:
-                    top,middle,bottom = card.get_card_image()
-                    print(middle, end='')
-                else:
-                    print('   ', end='')
-            print('')
-
-            #bottom
-            for x in range(self._board.get_width()):
-                # get the card at this x,y postion
-                card = self._board.get_item_value(x,y)
-                # make sure its not None (the default)
-                if card is not None:
-                    top,middle,bottom = card.get_card_image()
-                    print(bottom, end='')
-                else:
-                    print('   ', end='')
-            print('')
-
-            
-        # sleep(1)
+    def draw_board(self):
+        if self._headless:
+            return
+        # the renderer builds each frame as one string and only redraws the cells that changed since the last call
+        if self._renderer is None:
+            from board_renderer import BoardRenderer
+            self._renderer = BoardRenderer()
+        self._renderer.render(self._cards, self._cells)
 
 
     def get_grid_map(self):
-        return self._board
+        # the GridMap is only built on request, the board itself lives in self._cells / self._cards
+        grid = GridMap(BOARD_WIDTH, BOARD_HEIGHT, None)
+        for idx, card in enumerate(self._cards):
+            if card is not None:
+                grid.set_item_value(idx % BOARD_WIDTH, idx // BOARD_WIDTH, card)
+        return grid
     
     def get_item_value(self, x, y):
         if x < 0 or y < 0 or x >= 20 or y >= 20:
             return None
-        return self._board.get_item_value(x, y)
+        idx = y * BOARD_WIDTH + x
+        if not self._cells[idx] & CELL_OCCUPIED:
+            return None
+        return self._cards[idx]
     
 
     def is_valid_path(self, x, y, visited):
@@ -242,8 +675,7 @@ class GameBoard():
             return False
         if visited[x][y]:
             return False
-        card = self._board.get_item_value(x, y)
-        if card is None:
+        if not self._cells[y * BOARD_WIDTH + x] & CELL_OCCUPIED:
             return False
         return True
     
@@ -551,23 +983,20 @@ class GameBoard():
         return open_directions
     
     def get_valid_neighbors(self, x, y, current_card):
+        # the neighbours a real tunnel (not a dead end) of current_card at (x, y) runs into
         valid_neighbors = []
-        open_directions = self.get_open_directions(current_card)
-        
-        for dx, dy, current_exit, next_exit in open_directions:  # Assuming open_directions provides these
-            new_x, new_y = x + dx, y + dy
-            next_card = self._board.get_item_value(new_x, new_y)
-            
-            # Additional check to ensure the next card is not None and tunnels align
-            if next_card and self.tunnels_align(current_card, next_card, current_exit, next_exit):
-                valid_neighbors.append((new_x, new_y))
-                
+        for direction, neighbour_idx in NEIGHBOURS[y * BOARD_WIDTH + x]:
+            if current_card._links[direction] and self._cells[neighbour_idx] & OPPOSITE_EXIT[direction]:
+                valid_neighbors.append((neighbour_idx % BOARD_WIDTH, neighbour_idx // BOARD_WIDTH))
+
         return valid_neighbors
 
 
     def tunnels_align(self, current_card, next_card, current_exit, next_exit):
         """Checks if the tunnels between two cards align."""
-        print(f"Checking tunnel alignment between \n {current_card} and \n {next_card}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Checking tunnel alignment between \n %s and \n %s", current_card, next_card)
 
         # if not next_card.reveal_card():
         #     print(f"Next card is not revealed. Alignment failed.")
@@ -576,13 +1005,16 @@ class GameBoard():
         self_exit = self.get_exit_direction(current_card, current_exit)
         other_exit = self.get_exit_direction(next_card, next_exit)
         
-        print(f"Self exit: {self_exit}, Other exit: {other_exit}")
+        if debug:
+            logger.debug("Self exit: %s, Other exit: %s", self_exit, other_exit)
 
         if self_exit and other_exit and self.are_opposite_directions(self_exit, other_exit):
-            print("Tunnels align.")
+            if debug:
+                logger.debug("Tunnels align.")
             return True
         else:
-            print("Tunnels do not align.")
+            if debug:
+                logger.debug("Tunnels do not align.")
             return False
         
         
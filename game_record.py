@@ -0,0 +1,149 @@
+"""
+Binary game records and a replay engine.
+
+A record is a fixed header followed by one fixed-width record per move:
+- header: the magic bytes, the format version, the number of players, the seed of the game (an integer from 0 to
+  2**64 - 1) and the number of moves;
+- move: five bytes, the kind of move, the type id of the card played and three arguments:
+  x, y, rotation for a placement; x, y for a dynamite; the goal index for a map; target index and tool for a
+  sabotage or a mend; nothing for a discard or a pass.
+Records of many games can simply be written one after the other to the same file.
+A seeded game replays exactly from its seed and moves, see SaboteurBaseEnvironment.
+"""
+import mmap
+import struct
+import numpy as np
+from card import CARD_TYPES
+from saboteur_base_environment import SaboteurBaseEnvironment
+
+MAGIC = b'SABR'
+VERSION = 1
+# magic, version, number of players, seed, number of moves
+HEADER = struct.Struct('<4sBBQI')
+MAX_SEED = 2 ** 64 - 1
+MOVE_SIZE = 5
+MOVE_DTYPE = np.dtype([('kind', 'u1'), ('card', 'u1'), ('a', 'u1'), ('b', 'u1'), ('c', 'u1')])
+
+MOVE_KINDS = ('pass', 'place', 'discard', 'map', 'sabotage', 'mend', 'dynamite')
+
+
+def encode_move(action):
+    """Returns the five bytes of an action tuple (see SaboteurBaseEnvironment.generate_actions)."""
+    kind = action[0]
+    if kind == 'pass':
+        return bytes(MOVE_SIZE)
+    code = MOVE_KINDS.index(kind)
+    card_id = action[1].get_type_id()
+    if kind == 'discard':
+        return bytes((code, card_id, 0, 0, 0))
+    if kind == 'map':
+        return bytes((code, card_id, action[2], 0, 0))
+    if kind == 'place':
+        return bytes((code, card_id, action[2], action[3], action[4]))
+    # dynamite (x, y), sabotage and mend (target, tool)
+    return bytes((code, card_id, action[2], action[3], 0))
+
+
+def decode_move(move):
+    """Returns the action tuple of five move bytes (or a row of a MOVE_DTYPE array)."""
+    code, card_id, a, b, c = (int(value) for value in move)
+    kind = MOVE_KINDS[code]
+    if kind == 'pass':
+        return ('pass',)
+    card = CARD_TYPES[card_id]
+    if kind == 'discard':
+        return ('discard', card)
+    if kind == 'map':
+        return ('map', card, a)
+    if kind == 'place':
+        return ('place', card, a, b, c)
+    return (kind, card, a, b)
+
+
+def check_seed(seed):
+    """Raises ValueError unless seed is an integer from 0 to MAX_SEED, the seeds a record can hold."""
+    if not isinstance(seed, int) or not 0 <= seed <= MAX_SEED:
+        raise ValueError("Only games seeded with an integer from 0 to {0} can be recorded".format(MAX_SEED))
+
+
+class GameRecorder():
+    """Collects the moves of one seeded game; call record() with every action as it is applied."""
+
+    def __init__(self, env):
+        if env.seed is None:
+            raise ValueError("Only seeded games can be recorded")
+        check_seed(env.seed)
+        self.seed = env.seed
+        self.num_players = len(env.players)
+        self._moves = bytearray()
+
+    def record(self, action):
+        self._moves += encode_move(action)
+
+    def __len__(self):
+        return len(self._moves) // MOVE_SIZE
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, VERSION, self.num_players, self.seed, len(self)) + bytes(self._moves)
+
+
+def read_records(data):
+    """
+    Yields (seed, num_players, moves) for every game record in data (bytes, or a memory-mapped file),
+    moves being a MOVE_DTYPE array sharing memory with data.
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        magic, version, num_players, seed, num_moves = HEADER.unpack_from(view, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a game record at offset {0}".format(offset))
+        offset += HEADER.size
+        moves = np.frombuffer(view, dtype=MOVE_DTYPE, count=num_moves, offset=offset)
+        offset += num_moves * MOVE_SIZE
+        yield seed, num_players, moves
+
+
+def load_records(path):
+    """
+    Returns the (seed, num_players, moves) of every game in a record file. The file is memory-mapped rather than
+    read, and stays mapped as long as any of the moves arrays is alive.
+    """
+    with open(path, 'rb') as stream:
+        if not stream.seek(0, 2):
+            return []
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    return list(read_records(data))
+
+
+class Replay():
+    """
+    Rebuilds a recorded game at any move. While it plays forward it keeps a clone of the environment every
+    snapshot_interval moves, so seek() starts from the nearest snapshot instead of from the deal.
+    """
+
+    def __init__(self, seed, moves, snapshot_interval=16):
+        self.seed = seed
+        self.moves = moves
+        self.snapshot_interval = snapshot_interval
+        # snapshot k is the game after k * snapshot_interval moves
+        self._snapshots = [SaboteurBaseEnvironment(headless=True, seed=seed)]
+
+    def __len__(self):
+        return len(self.moves)
+
+    def get_action(self, index):
+        return decode_move(self.moves[index])
+
+    def seek(self, index):
+        """Returns a new environment holding the game after its first index moves (0 is the deal)."""
+        if index < 0 or index > len(self.moves):
+            raise IndexError("Move index {0} is out of range".format(index))
+        interval = self.snapshot_interval
+        snapshot = min(index // interval, len(self._snapshots) - 1)
+        env = self._snapshots[snapshot].clone()
+        for move in range(snapshot * interval, index):
+            env.apply(self.get_action(move))
+            if (move + 1) % interval == 0 and (move + 1) // interval == len(self._snapshots):
+                self._snapshots.append(env.clone())
+        return env
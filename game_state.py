@@ -0,0 +1,92 @@
+"""
+An immutable, hashable snapshot of a Saboteur game and the pure functions that play on it.
+Every field is bytes, a tuple or a number, so states can be shared between search trees, caches and worker
+processes without copying. Cards are stored as their type ids (see card.CARD_TYPES), actions are the tuples
+of SaboteurBaseEnvironment.generate_actions().
+"""
+from typing import NamedTuple
+from functools import lru_cache
+from saboteur_base_environment import SaboteurBaseEnvironment
+from determinization import ROLES
+
+
+class GameState(NamedTuple):
+    # the board, as returned by GameBoard.get_state()
+    cells: bytes
+    card_ids: bytes
+    requirements: bytes
+    connected: bytes
+    gold_found: bool
+    board_hash: int
+    # the type ids still in the deck, the top card last
+    deck: bytes
+    # per player, the type ids of their hand
+    hands: tuple
+    # per player, the index of their role in determinization.ROLES
+    roles: bytes
+    current_player: int
+    # per player, the bitmasks of their broken tools and of the goals they have looked at
+    broken_tools: bytes
+    peeked: bytes
+    # the type ids on the discard pile, who discarded each of them (see SaboteurBaseEnvironment._discard_owners)
+    # and the counts of the cards played face up
+    discards: bytes
+    discard_owners: bytes
+    played_counts: bytes
+    # Zobrist hash of the whole state, see SaboteurBaseEnvironment.get_hash()
+    zobrist: int
+
+    def __hash__(self):
+        return self.zobrist
+
+
+class Seat(NamedTuple):
+    # a stand-in for a player when a state is played without the real players: a name and a role is all the rules need
+    name: str
+    role: str
+
+
+@lru_cache(maxsize=None)
+def seats(roles):
+    return tuple(Seat('Player {0}'.format(index + 1), ROLES[role]) for index, role in enumerate(roles))
+
+
+def player_index(state, player):
+    """Returns the index of a player given as an index or by name ('Player 1' is index 0)."""
+    if isinstance(player, int):
+        return player
+    return next(index for index, seat in enumerate(seats(state.roles)) if seat.name == player)
+
+
+def step(state, action):
+    """Returns the state after the player to move plays action; state itself is left as it is."""
+    env = SaboteurBaseEnvironment.from_state(state)
+    env.apply(action)
+    return env.to_state()
+
+
+def legal_actions(state):
+    return SaboteurBaseEnvironment.from_state(state).generate_actions()
+
+
+def is_terminal(state):
+    # the same rule as SaboteurBaseEnvironment.is_terminal
+    return state.gold_found or not any(state.hands)
+
+
+def turn(state):
+    """Returns the name of the player to move."""
+    return seats(state.roles)[state.current_player].name
+
+
+def payoff(state, player):
+    """
+    Returns 1 if player (an index or a name) has won: Gold-Diggers when the gold is found,
+    Saboteurs when the game ends without it. Otherwise, and while the game goes on, returns 0.
+    """
+    role = ROLES[state.roles[player_index(state, player)]]
+    if state.gold_found:
+        return 1 if role == 'Gold-Digger' else 0
+    if is_terminal(state):
+        return 1 if role == 'Saboteur' else 0
+    return 0
@@ -0,0 +1,135 @@
+"""
+Feature planes of the game as the player to move sees it, for learned evaluators.
+
+An ObservationEncoder owns one preallocated (NUM_PLANES, BOARD_HEIGHT, BOARD_WIDTH) array and rewrites it in place:
+the board planes follow the change log of the board (see GameBoard.get_changes), so after a turn only the cells
+the turn touched and their neighbours are written again, and the player planes are a handful of broadcast fills.
+encode() hands back a read-only view of the array, so the next call overwrites what the caller holds.
+
+Planes, every one over the whole board:
+- EXIT_PLANES: one per exit (north, east, south, west) of the card in each cell;
+- START_PLANE, PATH_PLANE: the start card and the path cards played;
+- GOAL_HIDDEN_PLANE, GOAL_REVEALED_PLANE: the goal cards face down and face up;
+- REACHABLE_PLANE: the cards a tunnel from the start card reaches;
+- GOLD_CANDIDATE_PLANE: the goals that may hold the gold as far as the player knows (see GameBoard.get_gold_candidates);
+- PLACEMENT_PLANES: for every path card type id in PLACEMENT_TYPE_IDS, the cells it fits as it is.
+  Whether the player may place at all depends on their tools, see TOOL_PLANES;
+- HAND_PLANES: for every deck type id in HAND_TYPE_IDS, how many such cards the player holds;
+- TOOL_PLANES: for every seat from the player to move on, one plane per tool (see saboteur_base_environment.TOOLS), 1 if broken;
+- SABOTEUR_PLANE: 1 if the player is a Saboteur;
+- DECK_PLANE: the number of cards left in the deck.
+"""
+import numpy as np
+from card import CARD_TYPES, PathCard
+from deck import DECK_TEMPLATE
+from game_board import (BOARD_WIDTH, BOARD_HEIGHT, BOARD_CELLS, NEIGHBOURS, CELL_OCCUPIED, CELL_START, CELL_GOAL,
+                        CELL_REVEALED, PLACE_AS_IS, PLACEMENT_FITS_ARRAY)
+from saboteur_base_environment import TOOLS, NUM_PLAYERS
+
+# the path cards of the deck, both ways round, and every kind of card a hand can hold
+PLACEMENT_TYPE_IDS = tuple(card.get_type_id() for card in CARD_TYPES
+                           if isinstance(card, PathCard) and card._special_card is None)
+HAND_TYPE_IDS = tuple(sorted(set(DECK_TEMPLATE)))
+
+EXIT_PLANES = 0
+START_PLANE = EXIT_PLANES + 4
+PATH_PLANE = START_PLANE + 1
+GOAL_HIDDEN_PLANE = PATH_PLANE + 1
+GOAL_REVEALED_PLANE = GOAL_HIDDEN_PLANE + 1
+REACHABLE_PLANE = GOAL_REVEALED_PLANE + 1
+GOLD_CANDIDATE_PLANE = REACHABLE_PLANE + 1
+PLACEMENT_PLANES = GOLD_CANDIDATE_PLANE + 1
+HAND_PLANES = PLACEMENT_PLANES + len(PLACEMENT_TYPE_IDS)
+TOOL_PLANES = HAND_PLANES + len(HAND_TYPE_IDS)
+SABOTEUR_PLANE = TOOL_PLANES + NUM_PLAYERS * len(TOOLS)
+DECK_PLANE = SABOTEUR_PLANE + 1
+NUM_PLANES = DECK_PLANE + 1
+
+# the placement planes of a cell, indexed by its requirement byte (see GameBoard._update_frontier)
+_PLACEMENTS = np.array([[PLACEMENT_FITS_ARRAY[(CARD_TYPES[type_id].get_exit_mask() << 8) | requirement] & PLACE_AS_IS
+                         for type_id in PLACEMENT_TYPE_IDS]
+                        for requirement in range(256)], dtype=np.uint8)
+# the planes from EXIT_PLANES up to REACHABLE_PLANE of a cell, indexed by its cell code, so they are written in one go
+_CELL_PLANES = np.array([[code >> shift & 1 for shift in range(4)] +
+                         [code & CELL_START != 0,
+                          code & (CELL_OCCUPIED | CELL_START | CELL_GOAL) == CELL_OCCUPIED,
+                          code & (CELL_GOAL | CELL_REVEALED) == CELL_GOAL,
+                          code & (CELL_GOAL | CELL_REVEALED) == CELL_GOAL | CELL_REVEALED]
+                         for code in range(256)], dtype=np.uint8)
+_HAND_INDEX = {type_id: index for index, type_id in enumerate(HAND_TYPE_IDS)}
+# the broken tools of a bitmask, one flag per tool, and the seats in the order the player at each seat sees them
+_TOOL_FLAGS = np.array([[tools & tool != 0 for tool in TOOLS] for tools in range(256)], dtype=np.uint8)
+_SEAT_ORDER = (np.arange(NUM_PLAYERS)[np.newaxis, :] + np.arange(NUM_PLAYERS)[:, np.newaxis]) % NUM_PLAYERS
+
+
+class ObservationEncoder():
+    """Keeps the feature planes of one environment up to date; dtype is np.uint8 or np.float32."""
+
+    def __init__(self, dtype=np.uint8):
+        self._planes = np.zeros((NUM_PLANES, BOARD_HEIGHT, BOARD_WIDTH), dtype=dtype)
+        self._flat = self._planes.reshape(NUM_PLANES, BOARD_CELLS)
+        self._view = self._planes.view()
+        self._view.flags.writeable = False
+        # the board the planes were written from and how far into its change log
+        self._board = None
+        self._epoch = 0
+        self._position = 0
+
+    def encode(self, env, player=None):
+        """
+        Writes the planes of env as player (the player to move by default) sees them
+        and returns them as a read-only view of the buffer.
+        """
+        board = env.board
+        if board is not self._board:
+            self._board = board
+            self._epoch, self._position, cells = board.get_changes(-1, 0)
+        else:
+            self._epoch, self._position, cells = board.get_changes(self._epoch, self._position)
+        if cells is None:
+            self._write_cells(slice(None))
+        elif cells:
+            # a changed cell can change the requirements of its neighbours
+            touched = set(cells)
+            for idx in cells:
+                touched.update(neighbour_idx for _, neighbour_idx in NEIGHBOURS[idx])
+            self._write_cells(np.fromiter(touched, dtype=np.intp, count=len(touched)))
+        self._write_player(env, player if player is not None else env.current_player)
+        return self._view
+
+    def _write_cells(self, index):
+        # rewrites the board planes of the cells in index (an index array or a slice)
+        board = self._board
+        flat = self._flat
+        cells = np.frombuffer(board.get_cells(), dtype=np.uint8)[index]
+        flat[EXIT_PLANES:REACHABLE_PLANE, index] = _CELL_PLANES[cells].T
+        flat[REACHABLE_PLANE, index] = np.frombuffer(board.get_connected(), dtype=np.uint8)[index] != 0
+        requirements = np.frombuffer(board.get_requirements(), dtype=np.uint8)[index]
+        flat[PLACEMENT_PLANES:HAND_PLANES, index] = _PLACEMENTS[requirements].T
+
+    def _write_player(self, env, player):
+        # the planes that depend on who is looking: everything but the board, and what they know of the gold
+        planes = self._planes
+        flat = self._flat
+        player_index = env.players.index(player)
+        board = self._board
+
+        gold_plane = flat[GOLD_CANDIDATE_PLANE]
+        goal_locations = board.get_goal_locations()
+        for x, y in goal_locations:
+            gold_plane[y * BOARD_WIDTH + x] = 0
+        for index in board.get_gold_candidates(env.get_peeked(player)):
+            x, y = goal_locations[index]
+            gold_plane[y * BOARD_WIDTH + x] = 1
+
+        counts = np.zeros(len(HAND_TYPE_IDS), dtype=planes.dtype)
+        for card in env.get_hand(player):
+            type_id = card.get_type_id()
+            # path cards are counted by the type id they have in the deck
+            counts[_HAND_INDEX[type_id if type_id in _HAND_INDEX else type_id & ~1]] += 1
+        planes[HAND_PLANES:TOOL_PLANES] = counts[:, np.newaxis, np.newaxis]
+
+        tools = np.frombuffer(env.get_broken_tool_masks(), dtype=np.uint8)[_SEAT_ORDER[player_index]]
+        planes[TOOL_PLANES:SABOTEUR_PLANE] = _TOOL_FLAGS[tools].reshape(-1, 1, 1)
+        planes[SABOTEUR_PLANE] = player.role == 'Saboteur'
+        planes[DECK_PLANE] = len(env.deck)
@@ -1,12 +1,40 @@
 from une_ai.models.game_environment import GameEnvironment
-from card import PathCard, ActionCard, GoalCard
+from card import PathCard, ActionCard, GoalCard, CARD_TYPES
 from SaboteurPlayer import SaboteurPlayer
-from game_board import GameBoard
+from game_board import GameBoard, placement_grid, PLACE_AS_IS, PLACE_TURNED
 from deck import Deck
+from determinization import Determinizations, unseen_counts, sample_determinizations
+from zobrist import TURN_KEYS, TOOL_KEYS, hand_key
 
-from copy import deepcopy
+import numpy as np
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
+# the tools a sabotage card breaks and a mend card repairs, one bit each in the broken-tool state of a player
+PICK = 1
+LANTERN = 2
+CART = 4
+TOOLS = (PICK, LANTERN, CART)
+
+# a game always has NUM_PLAYERS players, each dealt HAND_SIZE cards
+NUM_PLAYERS = 8
+HAND_SIZE = 4
+# the type id standing for an empty hand slot in arrays of type ids
+EMPTY_SLOT = 0xFF
+
+# the owner recorded for the action cards on the discard pile: they were played face up, everyone knows them
+DISCARDED_FACE_UP = 0xFF
+
+
+def flip_tool(broken_tools, tool):
+    """
+    Returns the broken-tool bits (an int or a NumPy array of them) after a sabotage or a mend of tool, or after undoing one.
+    A sabotage only targets a whole tool and a mend a broken one, so both just flip the bit.
+    """
+    return broken_tools ^ tool
+
 
 class SaboteurBaseEnvironment(GameEnvironment):
     """
@@ -15,36 +43,71 @@ class SaboteurBaseEnvironment(GameEnvironment):
     It also initializes players, distributes cards and sets initial game state.
     It has methods to draw a card, get legal actions, check if the game is terminal and transition to a new game state.
     """
-    def __init__(self, num_players=8):  # Number of players is always 8
+    def __init__(self, num_players=NUM_PLAYERS, headless=False, seed=None):  # Number of players is always 8
         from agent_programs import mcts_agent_program
         # sys.setrecursionlimit(10000)
 
+        # a headless environment never renders, for batch simulations
+        self.headless = headless
+
+        # every random choice of the game (gold card, shuffle, roles) comes from one generator,
+        # so a seeded game plays out the same in any process. Unseeded games use the global random module
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+        # NumPy generator of the determinization sampler, kept apart so sampling never changes how the game plays out
+        self._sampler_rng = None
+        # feature planes of get_observation(), created on the first call
+        self._observation_encoder = None
+
        # Initialize game board and deck
-        self._board = GameBoard()
-        self.deck = Deck()
-        self.discard_pile = []      
+        self._board = GameBoard(headless=headless, rng=self.rng)
+        self.deck = Deck(self.rng)
+        self.discard_pile = []
+        # for every card on the discard pile, the index of the player who discarded it face down (only they know
+        # what it is), or DISCARDED_FACE_UP for an action card that was played
+        self._discard_owners = bytearray()
+        # cards everyone has seen leave the game: the action cards played and the path cards blown up,
+        # counted by deck type id like the cards on the board
+        self._played_counts = bytearray(len(CARD_TYPES))
 
         # Get the grid map from the game board
-        self.board = GameBoard.get_grid_map(self)
+        self.board = self._board
         
         # Create a pool of roles and randomly select 8 roles from the pool
         role_pool = ['Gold-Digger'] * 6 + ['Saboteur'] * 3
-        num_players = 8
+        num_players = NUM_PLAYERS
 
-        selected_roles = random.sample(role_pool, num_players)
+        selected_roles = self.rng.sample(role_pool, num_players)
 
-        # Initialize players
+        # Initialize players. The players (and their agents) are configuration shared by every clone,
+        # the hands are game state and belong to the environment: _hands[i] is the hand of players[i]
         self.players = []
+        self._hands = []
         self.current_player_index = 0
-
+        # Zobrist hash of the player to move and of every hand; the board keeps its own, see get_hash()
+        self._hash = TURN_KEYS[0]
+
+        # Distribute cards and set initial game state
+        hands = self.deck.deal(len(selected_roles), HAND_SIZE)
+        # the number of cards in all the hands together, kept up to date by draw_card, discard_card and undo,
+        # so is_terminal does not have to look at every hand
+        self._cards_in_hands = sum(len(hand) for hand in hands)
         for index, role in enumerate(selected_roles):
             # mcts_agent_instance = MCTSAgent(role, mcts_agent_program, num_simulations=1000, ucb1_const=2)
             player_instance = SaboteurPlayer(f'Player {index + 1}', mcts_agent_program, role)
-            # Distribute cards and set initial game state
-         # Distribute cards and set initial game state
-            for giveCard in range(0, 4):
-                self.draw_card(player_instance)
+            # the player's hand and hand sensor are the hand of this environment, so there is only one list to keep up to date
+            hand = player_instance.hand
+            player_instance._sensors['hand-sensor']['value'] = hand
             self.players.append(player_instance)
+            self._hands.append(hand)
+            for card in hands[index]:
+                self._hash ^= self._hand_card_key(index, hand, card)
+                hand.append(card)
+        # for every player, the bitmask of the goals (bit i for goal i) they have looked at with a map card
+        self._peeked = bytearray(len(self.players))
+        # for every player, the bitmask of their broken tools (PICK, LANTERN, CART); with any of them broken
+        # the player cannot place path cards
+        self._broken_tools = bytearray(len(self.players))
         
         self.rounds = 0
         self.scores = {}
@@ -74,124 +137,262 @@ class SaboteurBaseEnvironment(GameEnvironment):
         """
         # print(f"Type of player object: {type(player)}")
         # print(f"Value of player object: {player}")
-        # Safety Check: If 'hand-sensor' doesn't exist, create it
-        if 'hand-sensor' not in player._sensors:
-            player._sensors['hand-sensor'] = {'type': 'list', 'value': []}
+        # Safety Check: If 'hand-sensor' doesn't exist, create it (bare seats of a GameState have no sensors)
+        player_index = self.players.index(player)
+        hand = self._hands[player_index]
+        if hasattr(player, '_sensors') and 'hand-sensor' not in player._sensors:
+            player._sensors['hand-sensor'] = {'type': 'list', 'value': hand}
             
         if not self.deck.is_empty():
             new_card = self.deck.draw()
-            player.hand.append(new_card)
-            #add card to hand-sensor value also
-            player._sensors['hand-sensor']['value'].append(new_card)    
+            self._hash ^= self._hand_card_key(player_index, hand, new_card)
+            hand.append(new_card)
+            self._cards_in_hands += 1
+
+    def _hand_card_key(self, player_index, hand, card):
+        # key of one more/one less copy of this kind of card, with hand holding the other copies only
+        kind = card.get_kind()
+        count = 0
+        for other in hand:
+            if other.get_kind() == kind:
+                count += 1
+        return hand_key(player_index, kind, count)
+
+    def sample_determinizations(self, num_samples, player=None, out=None, rng=None):
+        """
+        This method samples num_samples determinizations of the game as seen by player (the current player by default).
+        The player's own hand and role and the board are kept; the cards the player has not seen are dealt at random
+        to the other hands and the deck, the other roles come from what is left of the role pool
+        and the gold goes under one of the goals it may still be under.
+        The samples are written into out (a determinization.Determinizations, reused when its shape fits) and returned.
+        rng is a NumPy Generator; by default the environment keeps one, seeded from the game seed.
+        """
+        if player is None:
+            player = self.current_player
+        player_index = self.players.index(player)
+        hand_ids = [card.get_type_id() for card in self._hands[player_index]]
+        hand_sizes = [len(hand) for hand in self._hands]
+        if out is None or not out.fits(num_samples, len(self.players), max(hand_sizes)):
+            out = Determinizations(num_samples, len(self.players), max(hand_sizes))
+        if rng is None:
+            if self._sampler_rng is None:
+                self._sampler_rng = np.random.default_rng(self.seed)
+            rng = self._sampler_rng
+
+        discarded_ids = [card.get_type_id() for card, owner in zip(self.discard_pile, self._discard_owners)
+                         if owner == player_index]
+        counts = unseen_counts(hand_ids, self._board.get_placed_counts(), self._played_counts, discarded_ids)
+        return sample_determinizations(out, rng, player_index, hand_ids, hand_sizes, len(self.deck), counts,
+                                       player.role, self._board.get_gold_candidates(self._peeked[player_index]))
+
+    def get_hash(self):
+        """
+        This method returns the 64-bit Zobrist hash of the game state: the board (cells, exits, orientations, reveals),
+        the player to move, the hand of every player as a multiset and the broken tools of every player. It is updated incrementally on every change.
+        """
+        return self._hash ^ self._board.get_hash()
     
  
         
     
-    def get_legal_actions(self, current_player):
+    def get_legal_actions(self, current_player, vectorized=False):
         """
         This method takes the current player object and returns a dictionary of valid card placements.
-        It checks if the card is a PathCard and its _exits are not [0, 0, 0, 0].
-        It then checks if the card can be placed on the game board and adds it to the dictionary if it can.
-        It also rotates the card and checks if it can be placed in the new orientation and adds it to the dictionary if it can.
+        It checks if the card is a PathCard with at least one exit.
+        Only the cells on the board frontier (empty cells next to the start card or a path card) are checked,
+        in both orientations of the card, so the cost follows the length of the tunnel edge rather than the board size.
+        Each check is a single lookup in the precomputed placement table of the board, so the card is never turned.
+        With vectorized=True all the path cards of the hand are checked against the whole board in one batch of NumPy operations instead.
+        A player with a broken tool has no valid placements.
         """
         # print("Debug: Checking if conditions are met.")
         
         validCardPlacements = {}
+        # a player with a broken tool cannot place anything
+        if self._broken_tools[self.players.index(current_player)]:
+            return validCardPlacements
+
+        if vectorized:
+            return self._get_legal_actions_vectorized(current_player)
 
-        for i in range(0, len(current_player.hand)): 
-                card = current_player.hand[i]
+        frontier = self._board.get_frontier()
+
+        hand = self.get_hand(current_player)
+        for i in range(0, len(hand)): 
+                card = hand[i]
         
-                # Check if it's a PathCard and its _exits are not [0, 0, 0, 0]
-                if isinstance(card, PathCard) and card._exits != [0, 0, 0, 0]:
+                # Check if it's a PathCard with at least one exit
+                if isinstance(card, PathCard) and card._exit_mask != 0:
                     
-                    for x in range(0, 20):
-                        for y in range(0, 20):
-                            if self._board.check_path_card(x, y, card):
-                                if card not in validCardPlacements:
-                                    validCardPlacements[card] = []
-                                validCardPlacements[card].append((x, y, 0))
-                            
-                            # Rotate and do the same
-                            card.turn_card()
-                            if self._board.check_path_card(x, y, card):
-                                if card not in validCardPlacements:
-                                    validCardPlacements[card] = []
-                                validCardPlacements[card].append((x, y, 1))
-                            
-                            # Rotate it back, so we know that position 0 is this position
-                            card.turn_card()
+                    # one table lookup per frontier cell answers both orientations
+                    placements = self._board.get_placements(card._exit_mask, frontier)
+                    if placements:
+                        validCardPlacements[card] = placements
                 
         return validCardPlacements
+
+    def generate_actions(self, player=None):
+        """
+        This method returns every legal action of player (the current player by default) as hashable tuples:
+        ('place', card, x, y, rotation) for both orientations of every path card,
+        ('sabotage', card, target_index, tool) for every tool of another player still whole and
+        ('mend', card, target_index, tool) for every broken tool of any player, with target_index an index in players,
+        ('map', card, goal_index) for every goal still face down, ('dynamite', card, x, y) for every path card on the board,
+        ('discard', card) for every card in the hand, and ('pass',) only when the hand is empty.
+        A card held several times gives its actions once, and a player with a broken tool gets no placements.
+        The frontier, the placed cards and the goals are looked up once for the whole hand.
+        """
+        if player is None:
+            player = self.current_player
+        player_index = self.players.index(player)
+        hand = self._hands[player_index]
+        if not hand:
+            return [('pass',)]
+
+        board = self._board
+        broken_tools = self._broken_tools
+        can_place = broken_tools[player_index] == 0
+        frontier = None
+        placed = None
+        goals = None
+        place_actions = []
+        card_actions = []
+        discard_actions = []
+        cards = []
+        for card in hand:
+            if card not in cards:
+                cards.append(card)
+
+        for card in cards:
+            if isinstance(card, PathCard):
+                if can_place and card._exit_mask != 0:
+                    if frontier is None:
+                        frontier = board.get_frontier()
+                    for x, y, rotation in board.get_placements(card._exit_mask, frontier):
+                        place_actions.append(('place', card, x, y, rotation))
+            else:
+                action = card.get_action()
+                if action == 'sabotage':
+                    for target_index in range(len(self.players)):
+                        if target_index != player_index:
+                            for tool in TOOLS:
+                                if not broken_tools[target_index] & tool:
+                                    card_actions.append(('sabotage', card, target_index, tool))
+                elif action == 'mend':
+                    for target_index in range(len(self.players)):
+                        if broken_tools[target_index]:
+                            for tool in TOOLS:
+                                if broken_tools[target_index] & tool:
+                                    card_actions.append(('mend', card, target_index, tool))
+                elif action == 'map':
+                    if goals is None:
+                        goals = [index for index, (x, y) in enumerate(board.get_goal_locations()) if not board.is_revealed(x, y)]
+                    for goal_index in goals:
+                        card_actions.append(('map', card, goal_index))
+                elif action == 'dynamite':
+                    if placed is None:
+                        placed = board.get_placed_cells()
+                    for x, y in placed:
+                        card_actions.append(('dynamite', card, x, y))
+            discard_actions.append(('discard', card))
+
+        return place_actions + card_actions + discard_actions
+
+    def _get_legal_actions_vectorized(self, current_player):
+        cards = [card for card in self.get_hand(current_player) if isinstance(card, PathCard) and card._exit_mask != 0]
+        validCardPlacements = {}
+        if not cards:
+            return validCardPlacements
+
+        fits = placement_grid(self._board.get_cell_grid(), [card._exit_mask for card in cards])
+        for card, card_fits in zip(cards, fits):
+            # transposed so that the cells come out sorted by x then y, like the frontier loop
+            xs, ys = np.nonzero(card_fits.T)
+            if len(xs) == 0:
+                continue
+            placements = []
+            for x, y, fit in zip(xs.tolist(), ys.tolist(), card_fits.T[xs, ys].tolist()):
+                if fit & PLACE_AS_IS:
+                    placements.append((x, y, 0))
+                if fit & PLACE_TURNED:
+                    placements.append((x, y, 1))
+            validCardPlacements[card] = placements
+        return validCardPlacements
    
     def is_terminal(self):
         """
         This method checks if the game is terminal.
-        It checks if all players have no cards in their hands, if the gold goal card is revealed or if the deck is empty.
+        The game ends when the gold card is reached or when all players have played out their hands.
+        An empty deck does not end it: the players stop drawing and play on with the cards they hold.
+        Both are a flag and a counter kept up to date as the game is played, so the check takes constant time.
         """
-        #check to see if players have cards in their hands
-        if all(len(player.hand) == 0 for player in self.players):
-            return True
-       
-        # Check if the gold goal card is revealed
-        for x, y in [(14, 8), (14, 10), (14, 12)]:
-            card = self.board.get_item_value(x, y)
-            if card._special_card == 'gold' and card._revealed == True:
-                return True
-
-        # Check if the deck is empty
-        if len([Deck.get_deck]) == 0:
-            return True
-        return False
+        return self._cards_in_hands == 0 or self._board.gold_found()
     
 
-    #TODO: Improve this function
-    def transition_result(current_state, action):
-            """
-            Takes the current game state and an action, and returns the new game state after applying the action.
-            """
-            # Make a deep copy of the current state to avoid modifying it directly
-            new_state = deepcopy(current_state)
-
-            # Extract relevant information from the current state
-            board = new_state.board
-            deck = new_state.deck
-            rounds = new_state.rounds
-            scores = new_state.scores
-            current_player_index = new_state.current_player_index
-            players = new_state.players
-
-            # Validate that all necessary keys exist
-            if board is None or deck is None or rounds is None or scores is None:
-                # raise Exception("Missing current_player_index or players in game_state")
-                pass
-
-            # Apply the action to update the game state
-            action_type = []
-             
-            if action_type == 'place_card':
-                x, y = action[1], action[2]
-                card_to_place = deck.pop()  # Assuming the top card in the deck is the one to be placed
-                board[x][y] = card_to_place  # Place the card on the board
-
-            elif action_type == 'draw_card':
-                # Draw a card from the deck and give it to the current player
-                drawn_card = deck.pop()
-                players[current_player_index]['hand'].append(drawn_card)
-
-            # Update other state variables as necessary
-            rounds += 1
-            current_player_index = (current_player_index + 1)
-
-            # Update the new_state dictionary
-            new_state._sensors['game-board-sensor']['value'] = board
-            new_state.deck = deck
-            new_state.rounds = rounds
-            new_state.scores = scores  # Update if necessary
-            new_state.current_player_index = current_player_index
-            new_state.players = players
-
-            return new_state   
-    
+    @staticmethod
+    def transition_result(game_state, action):
+        """
+        Takes a game_state.GameState and an action, and returns the new GameState after applying the action.
+        The given state is left as it is.
+        """
+        from game_state import step
+        return step(game_state, action)
+
+    def to_state(self):
+        """
+        This method returns an immutable, hashable game_state.GameState snapshot of the game,
+        which SaboteurBaseEnvironment.from_state turns back into an environment.
+        """
+        from game_state import GameState
+        from determinization import ROLES
+        cells, card_ids, requirements, connected, gold_found, board_hash = self._board.get_state()
+        return GameState(
+            cells, card_ids, requirements, connected, gold_found, board_hash,
+            bytes(self.deck.get_ids()),
+            tuple(bytes(card.get_type_id() for card in hand) for hand in self._hands),
+            bytes(ROLES.index(player.role) for player in self.players),
+            self.current_player_index,
+            bytes(self._broken_tools),
+            bytes(self._peeked),
+            bytes(card.get_type_id() for card in self.discard_pile),
+            bytes(self._discard_owners),
+            bytes(self._played_counts),
+            self.get_hash())
+
+    @staticmethod
+    def from_state(game_state, players=None):
+        """
+        This method builds a headless environment playing from a game_state.GameState. The players default to
+        bare seats holding a name and the role of the state; the environment draws from the global random module.
+        """
+        from game_state import seats
+        env = SaboteurBaseEnvironment.__new__(SaboteurBaseEnvironment)
+        env.headless = True
+        env.seed = None
+        env.rng = random
+        env._sampler_rng = None
+        env._observation_encoder = None
+        env._board = GameBoard.from_state(game_state.cells, game_state.card_ids, game_state.requirements,
+                                          game_state.connected, game_state.gold_found, game_state.board_hash)
+        env.board = env._board
+        env.deck = Deck.from_ids(game_state.deck)
+        env.discard_pile = [CARD_TYPES[type_id] for type_id in game_state.discards]
+        env._discard_owners = bytearray(game_state.discard_owners)
+        env._played_counts = bytearray(game_state.played_counts)
+        env.players = list(players) if players is not None else list(seats(game_state.roles))
+        env._hands = [[CARD_TYPES[type_id] for type_id in hand] for hand in game_state.hands]
+        env._cards_in_hands = sum(len(hand) for hand in game_state.hands)
+        env.current_player_index = game_state.current_player
+        env.current_player = env.players[game_state.current_player]
+        env._hash = game_state.zobrist ^ game_state.board_hash
+        env._peeked = bytearray(game_state.peeked)
+        env._broken_tools = bytearray(game_state.broken_tools)
+        env.rounds = 0
+        env.scores = {}
+        env._sensors = {}
+        env._actuators = {}
+        return env
+
     def get_game_state(self):
         # Construct the game_state dictionary
         game_state = {
@@ -202,7 +403,7 @@ class SaboteurBaseEnvironment(GameEnvironment):
             # 'current_player_index': self.current_player_index,  # Added this line to include current_player_index in game_state
             'current_player_index': self.current_player_index,           
             'player-turn': self.players[self.current_player_index]._agent_name,
-            'hand-sensor': self.players[self.current_player_index]._sensors['hand-sensor'],
+            'hand-sensor': {'value': self._hands[self.current_player_index]},
         }
         return game_state
     
@@ -220,36 +421,132 @@ class SaboteurBaseEnvironment(GameEnvironment):
         player_info = []
         
         # Loop through each player in self._players to collect their information
-        for player in self.players:
+        for index, player in enumerate(self.players):
             player_sensors = {
                 'name': player._agent_name,
                 'role': player.role,
-                'hand': player.hand,
+                'hand': self._hands[index],
                 'agent': player._agent_program,
-                'sabotaged': player.sabotaged,
-                'score': self.scores[player]
+                'sabotaged': self._broken_tools[index] != 0,
+                'score': self.scores.get(player, 0)
             }
-        player_info.append(player_sensors)
+            player_info.append(player_sensors)
         
         return player_info        
     
     @staticmethod
     def turn(game_state):
-        return game_state['players'][game_state['current_player_index']].name
+        # the name of the player to move in a game_state.GameState
+        from game_state import turn
+        return turn(game_state)
     
     @staticmethod
     def payoff(game_state, player_name):
-        player = next(player for player in game_state['players'] if player.name == player_name)
-        if player.role == 'Gold-Digger' and game_state['game_board'].gold_found():
-            return 1  # Gold-Diggers win when gold is found
-        elif player.role == 'Saboteur' and not game_state['game_board'].gold_found():
-            return 1  # Saboteurs win when gold is not found
-        else:
-            return 0  # Otherwise, this player did not achieve their objective
+        # 1 if the player (a name or an index) has won in a game_state.GameState, else 0
+        from game_state import payoff
+        return payoff(game_state, player_name)
                     
     #TODO : Implement this function
     def state_transition(self):
        pass
+
+    def apply(self, action):
+        """
+        This method plays a whole turn for the current player in place and returns an undo token for undo().
+        The action is one of the tuples of generate_actions(); ('place', card, x, y, rotation) with rotation 1
+        places the card turned. The card leaves the hand, a new card is drawn if the deck is not empty
+        and the turn passes to the next player. A pass only passes the turn.
+        The token only records what the turn touched, so search code can walk down and back up the tree without copying the environment.
+        """
+        player_index = self.current_player_index
+        previous_hash = self._hash
+        player = self.players[player_index]
+        hand = self._hands[player_index]
+        kind = action[0]
+
+        card = None
+        hand_position = None
+        if kind != 'pass':
+            card = action[1]
+            hand_position = hand.index(card)
+            self.discard_card(player, card)
+
+        change = None
+        if kind == 'place':
+            _, _, x, y, rotation = action
+            change = self._board.add_path_card(x, y, card.turned() if rotation == 1 else card)
+        elif kind == 'discard':
+            self.discard_pile.append(card)
+            self._discard_owners.append(player_index)
+        elif kind == 'dynamite':
+            _, _, x, y = action
+            change = self._board.remove_path_card(x, y)
+            self._played_counts[change[0].get_type_id() & ~1] += 1
+        elif kind == 'map':
+            change = self._peeked[player_index]
+            self._peeked[player_index] |= 1 << action[2]
+        elif kind == 'sabotage' or kind == 'mend':
+            _, _, target_index, tool = action
+            self._broken_tools[target_index] = flip_tool(self._broken_tools[target_index], tool)
+            self._hash ^= TOOL_KEYS[(target_index << 3) | tool]
+        elif kind != 'pass':
+            raise ValueError("Unknown action '{0}'".format(kind))
+        if kind in ('dynamite', 'map', 'sabotage', 'mend'):
+            self._played_counts[card.get_type_id()] += 1
+            self.discard_pile.append(card)
+            self._discard_owners.append(DISCARDED_FACE_UP)
+
+        drawn_card = None
+        if card is not None and not self.deck.is_empty():
+            self.draw_card(player)
+            drawn_card = hand[-1]
+
+        self.get_next_player()
+        return (action, player_index, hand_position, change, drawn_card, previous_hash)
+
+    def undo(self, undo_token):
+        """
+        This method takes back the turn played by apply(), given the token it returned.
+        Turns have to be undone in the reverse order they were applied.
+        """
+        action, player_index, hand_position, change, drawn_card, previous_hash = undo_token
+        self.current_player_index = player_index
+        self.current_player = self.players[player_index]
+        hand = self._hands[player_index]
+        kind = action[0]
+
+        if drawn_card is not None:
+            hand.pop()
+            self._cards_in_hands -= 1
+            self.deck.put_back(drawn_card)
+
+        if kind == 'pass':
+            self._hash = previous_hash
+            return
+
+        card = action[1]
+        if kind in ('dynamite', 'map', 'sabotage', 'mend'):
+            self._played_counts[card.get_type_id()] -= 1
+            self.discard_pile.pop()
+            self._discard_owners.pop()
+        if kind == 'place':
+            _, _, x, y, rotation = action
+            self._board.undo_add_path_card(x, y, change)
+        elif kind == 'discard':
+            self.discard_pile.pop()
+            self._discard_owners.pop()
+        elif kind == 'dynamite':
+            _, _, x, y = action
+            self._played_counts[change[0].get_type_id() & ~1] -= 1
+            self._board.undo_remove_path_card(x, y, change)
+        elif kind == 'map':
+            self._peeked[player_index] = change
+        elif kind == 'sabotage' or kind == 'mend':
+            _, _, target_index, tool = action
+            self._broken_tools[target_index] = flip_tool(self._broken_tools[target_index], tool)
+        hand.insert(hand_position, card)
+        self._cards_in_hands += 1
+        self._hash = previous_hash
     
 
     # def pass_turn(self, player):
@@ -327,24 +624,94 @@ class SaboteurBaseEnvironment(GameEnvironment):
         #print gameboard to see what cards are in the players hand
         # print("Gameboard:", self.game_board)
         
-        if card_to_discard in player.hand:
-            player.hand.remove(card_to_discard)
+        player_index = self.players.index(player)
+        hand = self._hands[player_index]
+        if card_to_discard in hand:
+            hand.remove(card_to_discard)
+            self._cards_in_hands -= 1
+            self._hash ^= self._hand_card_key(player_index, hand, card_to_discard)
         else:
-            print("Card not found in player's hand.")
+            logger.debug("Card not found in player's hand.")
      
     def get_next_player(self):
-        current_player_index = self.players.index(self.current_player)
-        next_player_index = (current_player_index + 1) 
-        next_player_index = next_player_index % 8
-
-        self.current_player = self.players[next_player_index]
+        self._hash ^= TURN_KEYS[self.current_player_index]
+        self.current_player_index = (self.current_player_index + 1) % len(self.players)
+        self._hash ^= TURN_KEYS[self.current_player_index]
+        self.current_player = self.players[self.current_player_index]
            
 
+    def get_hand(self, player):
+        """Returns the hand of a player in this environment (clones each keep their own)."""
+        return self._hands[self.players.index(player)]
+
+    def clone(self, share_rng=False):
+        """
+        This method returns an independent copy of the game state: board, deck, hands, discards, peeks,
+        broken tools, current player and hash. The players, their agents and the sensor and actuator
+        configuration are shared with the original.
+        A seeded game's random generator is copied too, so random choices made on the clone (e.g. rollouts)
+        never change how the original plays out. Copying it is the dearest part of a clone; with share_rng
+        the clone draws from the original's generator instead. Unseeded games all draw from the global random module.
+        """
+        env = SaboteurBaseEnvironment.__new__(SaboteurBaseEnvironment)
+        env.headless = self.headless
+        env.seed = self.seed
+        if share_rng or self.rng is random:
+            env.rng = self.rng
+        else:
+            env.rng = random.Random.__new__(random.Random)
+            env.rng.setstate(self.rng.getstate())
+        env._sampler_rng = None
+        env._observation_encoder = None
+        env._board = self._board.clone()
+        env.board = env._board
+        env.deck = self.deck.clone()
+        env.discard_pile = self.discard_pile[:]
+        env._discard_owners = self._discard_owners[:]
+        env._played_counts = self._played_counts[:]
+        env.players = self.players
+        env._hands = [hand[:] for hand in self._hands]
+        env._cards_in_hands = self._cards_in_hands
+        env.current_player_index = self.current_player_index
+        env.current_player = self.current_player
+        env._hash = self._hash
+        env._peeked = self._peeked[:]
+        env._broken_tools = self._broken_tools[:]
+        env.rounds = self.rounds
+        env.scores = dict(self.scores)
+        env._sensors = self._sensors
+        env._actuators = self._actuators
+        return env
+
+    def get_observation(self, player=None):
+        """
+        Returns the feature planes (see observation.py) of the game as player, the player to move by default, sees it.
+        The planes are a read-only view of a buffer this environment keeps and updates from the board changes,
+        so they are overwritten by the next call; copy them to keep them.
+        """
+        if self._observation_encoder is None:
+            from observation import ObservationEncoder
+            self._observation_encoder = ObservationEncoder()
+        return self._observation_encoder.encode(self, player)
+
+    def get_broken_tools(self, player):
+        """Returns the bitmask of the broken tools (PICK, LANTERN, CART) of a player."""
+        return self._broken_tools[self.players.index(player)]
+
+    def get_broken_tool_masks(self):
+        """Returns the broken-tool bitmasks of every player, in player order, as bytes."""
+        return bytes(self._broken_tools)
+
+    def get_peeked(self, player):
+        """Returns the bitmask of the goals (bit i for goal i) a player has looked at with a map card."""
+        return self._peeked[self.players.index(player)]
+
+    def is_sabotaged(self, player):
+        return self._broken_tools[self.players.index(player)] != 0
+
     def get_winner(self):
-        for card in self._board._goal_cards:
-            if card._special_card == 'gold' and card._revealed == True:
-                return 'Gold-Digger'
-            
+        if self._board.gold_found():
+            return 'Gold-Digger'
         return "Saboteur"
 
     # def choose_goal_card(self, game_board):
@@ -368,6 +735,10 @@ class SaboteurBaseEnvironment(GameEnvironment):
         
     def add_player(self, player):
         self.players.append(player)
+        self._hands.append(player.hand)
+        self._cards_in_hands += len(player.hand)
+        self._peeked.append(0)
+        self._broken_tools.append(0)
         self.scores[player] = 0
 
 
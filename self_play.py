@@ -0,0 +1,156 @@
+"""
+Self-play runner: plays many seeded, headless games of the app's agents across a pool of worker processes
+and aggregates the results into win rates with confidence intervals.
+
+    python self_play.py --games 100000 --seed 1
+
+Game i of a run is played with seed + i, so any game can be replayed alone with saboteur_app.py --seed,
+with --record every game is also written to a game_record file and with --dataset every move
+becomes a row of a dataset_writer dataset.
+"""
+import argparse
+import math
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from saboteur_base_environment import SaboteurBaseEnvironment
+from saboteur_app import choose_action
+from game_record import GameRecorder
+from dataset_writer import DatasetWriter, Trajectory
+
+# the outcome of one game: the winning role, the number of turns, the number of cards played
+# (every turn but a pass), the wall time in seconds and, when asked for, the game record bytes
+# and the dataset rows (column arrays, see dataset_writer.Trajectory)
+GameResult = namedtuple('GameResult', ['seed', 'winner', 'turns', 'cards_played', 'seconds', 'record', 'rows'],
+                        defaults=[None, None])
+
+
+def play_game(seed, record=False, rows=False):
+    """Plays one headless game with the given seed and returns its GameResult."""
+    start = time.perf_counter()
+    env = SaboteurBaseEnvironment(headless=True, seed=seed)
+    recorder = GameRecorder(env) if record else None
+    trajectory = Trajectory() if rows else None
+    turns = 0
+    cards_played = 0
+    while not env.is_terminal():
+        action = choose_action(env, env.current_player)
+        if trajectory is not None:
+            trajectory.add(env, action)
+        env.apply(action)
+        if recorder is not None:
+            recorder.record(action)
+        turns += 1
+        if action[0] != 'pass':
+            cards_played += 1
+    return GameResult(seed, env.get_winner(), turns, cards_played, time.perf_counter() - start,
+                      recorder.to_bytes() if recorder is not None else None,
+                      trajectory.finish(env) if trajectory is not None else None)
+
+
+def play_games(seeds, record=False, rows=False):
+    # the work of one worker task: a chunk of games, sent back together
+    return [play_game(seed, record, rows) for seed in seeds]
+
+
+def wilson_interval(wins, games, z=1.96):
+    """Returns the Wilson score interval (low, high) of a win rate, 95% by default."""
+    if games == 0:
+        return (0.0, 1.0)
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return (max(0.0, centre - margin), min(1.0, centre + margin))
+
+
+class SelfPlayStats():
+    """Running totals over the results of a run."""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = {'Gold-Digger': 0, 'Saboteur': 0}
+        self.turns = 0
+        self.cards_played = 0
+        self.seconds = 0.0
+
+    def add(self, result):
+        self.games += 1
+        self.wins[result.winner] += 1
+        self.turns += result.turns
+        self.cards_played += result.cards_played
+        self.seconds += result.seconds
+
+    def win_rate(self, role):
+        """Returns (rate, low, high) for a role, the bounds being its 95% Wilson interval."""
+        wins = self.wins[role]
+        low, high = wilson_interval(wins, self.games)
+        return (wins / self.games if self.games else 0.0, low, high)
+
+    def summary(self):
+        lines = ['{0} games'.format(self.games)]
+        for role in self.wins:
+            rate, low, high = self.win_rate(role)
+            lines.append('{0}: {1:.4f} [{2:.4f}, {3:.4f}]'.format(role, rate, low, high))
+        if self.games:
+            lines.append('mean turns {0:.1f}, mean cards played {1:.1f}, mean game time {2:.2f} ms'.format(
+                self.turns / self.games, self.cards_played / self.games, 1000 * self.seconds / self.games))
+        return '\n'.join(lines)
+
+
+def run(num_games, seed=0, workers=None, chunk_size=200, record=False, rows=False):
+    """
+    Plays num_games games with seeds seed .. seed + num_games - 1 across workers processes (one per CPU by default)
+    and yields the results chunk by chunk as they come back, in no particular order.
+    At most two chunks per worker are submitted at a time, so the pending work and results stay bounded.
+    """
+    workers = workers or os.cpu_count() or 1
+    starts = iter(range(seed, seed + num_games, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(start):
+            return executor.submit(play_games, range(start, min(start + chunk_size, seed + num_games)), record, rows)
+        pending = {submit(start) for _, start in zip(range(2 * workers), starts)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = next(starts, None)
+                if start is not None:
+                    pending.add(submit(start))
+                yield future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many Saboteur games in parallel and report win rates.')
+    parser.add_argument('--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, the others follow it')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, one per CPU by default')
+    parser.add_argument('--chunk-size', type=int, default=200, help='games per worker task')
+    parser.add_argument('--record', default=None, help='file to append the record of every game to')
+    parser.add_argument('--dataset', default=None, help='dataset directory to add the moves of every game to')
+    args = parser.parse_args()
+
+    stats = SelfPlayStats()
+    start = time.perf_counter()
+    record_file = open(args.record, 'ab') if args.record else None
+    dataset = DatasetWriter(args.dataset) if args.dataset else None
+    try:
+        for results in run(args.games, args.seed, args.workers, args.chunk_size,
+                           record=record_file is not None, rows=dataset is not None):
+            for result in results:
+                stats.add(result)
+                if record_file is not None:
+                    record_file.write(result.record)
+                if dataset is not None:
+                    dataset.write(result.rows)
+    finally:
+        if record_file is not None:
+            record_file.close()
+        if dataset is not None:
+            dataset.close()
+    print(stats.summary())
+    print('{0:.1f} s wall time'.format(time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
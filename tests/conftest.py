@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+
+# the game modules live at the top of the repository, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card import PathCard, DIRECTION_BITS  # noqa: E402
+from saboteur_base_environment import SaboteurBaseEnvironment  # noqa: E402
+
+# the path cards of the deck, as the factories that make them
+PATH_CARD_FACTORIES = (
+    PathCard.vertical_tunnel, PathCard.horizontal_tunnel, PathCard.vertical_junction, PathCard.horizontal_junction,
+    PathCard.turn, PathCard.reversed_turn, PathCard.cross_road,
+    lambda: PathCard.dead_end(['south']), lambda: PathCard.dead_end(['north', 'east', 'south']),
+    lambda: PathCard.dead_end(['west', 'east']))
+
+
+def random_path_card(rng):
+    """Returns a path card of a random kind, turned half of the time."""
+    card = rng.choice(PATH_CARD_FACTORIES)()
+    if rng.random() < 0.5:
+        card = card.turned()
+    return card
+
+
+def joined_exits(card, bit):
+    """Returns the exits a tunnel entering card by the exit bit can leave by, worked out from its tunnels."""
+    exits = bit
+    grown = True
+    while grown:
+        grown = False
+        for tunnel in card.get_tunnels():
+            if None in tunnel:
+                continue
+            mask = DIRECTION_BITS[tunnel[0]] | DIRECTION_BITS[tunnel[1]]
+            if exits & mask and exits | mask != exits:
+                exits |= mask
+                grown = True
+    return exits
+
+
+def play_random_game(seed, tokens=None, max_moves=200, **env_args):
+    """
+    Plays a headless game seeded with seed, picking every move at random with a generator seeded the same.
+    Yields (env, action) before each move and makes the move when resumed; the undo token of every move
+    is appended to tokens, if given.
+    """
+    rng = random.Random(seed)
+    env = SaboteurBaseEnvironment(headless=True, seed=seed, **env_args)
+    moves = 0
+    while not env.is_terminal() and moves < max_moves:
+        action = rng.choice(env.generate_actions())
+        yield env, action
+        token = env.apply(action)
+        if tokens is not None:
+            tokens.append(token)
+        moves += 1
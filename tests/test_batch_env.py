@@ -0,0 +1,72 @@
+import numpy as np
+from batch_env import BatchSaboteurEnv, EMPTY_SLOT
+from determinization import ROLES
+from saboteur_base_environment import SaboteurBaseEnvironment
+
+
+def replay_env(batch, index):
+    # the environment game index of the batch plays out like
+    return SaboteurBaseEnvironment(headless=True, seed=int(batch.game_seeds[index]))
+
+
+def assert_same_game(batch, index, env):
+    board = env.board
+    assert bytes(batch.cells[index]) == bytes(board.get_cells())
+    assert bytes(batch.connected[index]) == bytes(board._connected)
+    for player_index, hand in enumerate(env._hands):
+        held = [int(type_id) for type_id in batch.hands[index, player_index] if type_id != EMPTY_SLOT]
+        assert held == [card.get_type_id() for card in hand]
+    assert list(batch.deck[index, :batch.deck_top[index]]) == list(env.deck.get_ids())
+    assert batch.current[index] == env.current_player_index
+    assert bytes(batch.broken_tools[index]) == bytes(env._broken_tools)
+    assert bytes(batch.peeked[index]) == bytes(env._peeked)
+    assert list(batch.roles[index]) == [ROLES.index(player.role) for player in env.players]
+
+
+def test_batch_matches_seeded_environments():
+    batch = BatchSaboteurEnv(8, seed=3)
+    envs = [replay_env(batch, index) for index in range(batch.num_games)]
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(600):
+        mask = batch.legal_mask()
+        for index, env in enumerate(envs):
+            assert_same_game(batch, index, env)
+            # two copies of a card in a hand give the same actions from two slots, generate_actions lists them once
+            decoded = {batch.decode_action(index, action) for action in np.flatnonzero(mask[index])}
+            assert decoded == set(env.generate_actions())
+        actions = np.array([rng.choice(np.flatnonzero(row)) for row in mask])
+        played = [batch.decode_action(index, action) for index, action in enumerate(actions)]
+        rewards, done = batch.step(actions)
+        for index, env in enumerate(envs):
+            env.apply(played[index])
+            assert env.is_terminal() == done[index]
+            if done[index]:
+                winner = env.get_winner()
+                assert list(rewards[index]) == [int(player.role == winner) for player in env.players]
+                envs[index] = replay_env(batch, index)
+                finished += 1
+            else:
+                assert not rewards[index].any()
+    assert finished > 0
+
+
+def test_encode_action_inverts_decode_action():
+    batch = BatchSaboteurEnv(4, seed=5)
+    mask = batch.legal_mask()
+    for index in range(batch.num_games):
+        for action in np.flatnonzero(mask[index]):
+            decoded = batch.decode_action(index, action)
+            # encode_action picks the first slot holding the card, which may be another copy of it
+            encoded = batch.encode_action(index, decoded)
+            assert mask[index, encoded] and batch.decode_action(index, encoded) == decoded
+
+
+def test_seeded_batches_play_out_the_same():
+    first = BatchSaboteurEnv(4, seed=9)
+    second = BatchSaboteurEnv(4, seed=9)
+    for _ in range(100):
+        actions = [np.flatnonzero(row)[0] for row in first.legal_mask()]
+        first.step(actions)
+        second.step(actions)
+    assert (first.cells == second.cells).all() and (first.game_seeds == second.game_seeds).all()
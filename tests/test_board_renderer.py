@@ -0,0 +1,61 @@
+import io
+import random
+from board_renderer import BoardRenderer, CLEAR_SCREEN, MOVE_CURSOR, EMPTY_CELL
+from card import PathCard
+from game_board import GameBoard, BOARD_WIDTH, BOARD_HEIGHT, CELL_REVEALED
+
+
+def render(renderer, board):
+    out = renderer._out
+    out.seek(0)
+    out.truncate()
+    renderer.render(board._cards, board._cells)
+    return out.getvalue()
+
+
+def new_board():
+    random.seed(0)
+    board = GameBoard()
+    return board, BoardRenderer(out=io.StringIO())
+
+
+def test_first_frame_draws_every_cell():
+    board, renderer = new_board()
+    lines = []
+    for y in range(BOARD_HEIGHT):
+        images = [board.get_item_value(x, y).get_card_image(board.get_cell(x, y) & CELL_REVEALED != 0)
+                  if board.get_item_value(x, y) is not None else EMPTY_CELL for x in range(BOARD_WIDTH)]
+        lines += [''.join(image[line] for image in images) for line in range(3)]
+    assert render(renderer, board) == CLEAR_SCREEN + '\n'.join(lines) + '\n'
+
+
+def test_later_frames_only_redraw_the_changed_cells():
+    board, renderer = new_board()
+    render(renderer, board)
+    # nothing changed: the cursor just goes back under the board
+    under_board = MOVE_CURSOR.format(BOARD_HEIGHT * 3 + 1, 1)
+    assert render(renderer, board) == under_board
+
+    card = PathCard.horizontal_tunnel()
+    board.add_path_card(7, 10, card)
+    top, middle, bottom = card.get_card_image()
+    expected = (MOVE_CURSOR.format(31, 22) + top + MOVE_CURSOR.format(32, 22) + middle +
+                MOVE_CURSOR.format(33, 22) + bottom + under_board)
+    assert render(renderer, board) == expected
+
+
+def test_reset_draws_a_full_frame_again():
+    board, renderer = new_board()
+    first = render(renderer, board)
+    renderer.reset()
+    assert render(renderer, board) == first
+
+
+def test_headless_board_draws_nothing(capfd):
+    random.seed(0)
+    board = GameBoard(headless=True)
+    board.draw_board()
+    board.draw_board_numbers()
+    assert capfd.readouterr().out == ''
+    GameBoard().draw_board()
+    assert capfd.readouterr().out != ''
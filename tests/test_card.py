@@ -0,0 +1,84 @@
+import copy
+import itertools
+import pickle
+import pytest
+from conftest import PATH_CARD_FACTORIES, joined_exits
+from card import (CARD_TYPES, CARD_IMAGES, ActionCard, PathCard, StartingCard, GoalCard, InvalidTunnel, EXIT_BITS,
+                  DIRECTION_BITS, get_card_type, turn_exit_mask)
+
+PATH_CARDS = [card for card in CARD_TYPES if isinstance(card, PathCard)]
+
+
+@pytest.mark.parametrize('factory', PATH_CARD_FACTORIES)
+def test_path_cards_are_interned(factory):
+    card = factory()
+    assert factory() is card
+    assert card.turned().turned() is card
+    assert card.turned().get_exit_mask() == turn_exit_mask(card.get_exit_mask())
+    assert get_card_type(card.get_type_id()) is card
+
+
+@pytest.mark.parametrize('action', ['map', 'sabotage', 'mend', 'dynamite'])
+def test_action_cards_are_interned(action):
+    card = ActionCard.of(action)
+    assert card.get_kind() == action
+    assert get_card_type(card.get_type_id()) is card
+
+
+@pytest.mark.parametrize('card', CARD_TYPES, ids=lambda card: 'type-{0}'.format(card.get_type_id()))
+def test_copies_are_the_same_card(card):
+    assert copy.copy(card) is card
+    assert copy.deepcopy(card) is card
+    assert pickle.loads(pickle.dumps(card)) is card
+
+
+@pytest.mark.parametrize('card', PATH_CARDS, ids=lambda card: 'type-{0}'.format(card.get_type_id()))
+def test_links_follow_the_tunnels(card):
+    ends = 0
+    for tunnel in card.get_tunnels():
+        ends |= DIRECTION_BITS[tunnel[0]] | (DIRECTION_BITS[tunnel[1]] if tunnel[1] is not None else 0)
+    assert card.get_exit_mask() == ends
+    for bit in EXIT_BITS:
+        if not card.get_exit_mask() & bit:
+            assert card.get_links(bit) == 0
+            continue
+        exits = joined_exits(card, bit)
+        # an exit joined to no other is a dead end and leads nowhere
+        assert card.get_links(bit) == (exits if exits != bit else 0)
+        assert card.turned().get_links(turn_exit_mask(bit)) == turn_exit_mask(card.get_links(bit))
+
+
+@pytest.mark.parametrize('card', PATH_CARDS, ids=lambda card: 'type-{0}'.format(card.get_type_id()))
+def test_card_images_come_from_the_table(card):
+    for revealed in (False, True):
+        image = card.get_card_image(revealed)
+        assert image is CARD_IMAGES[(card.get_type_id() << 1) | revealed]
+        assert image == card._build_card_image(revealed)
+    assert str(card) == '\n'.join(card.get_card_image())
+
+
+def test_constructors_return_the_interned_cards():
+    assert ActionCard('map') is ActionCard.of('map')
+    assert PathCard([('east', 'south')]) is PathCard.turn()
+    assert PathCard([('west', 'east')]) is PathCard.horizontal_tunnel()
+    assert PathCard([('south', None)]) is PathCard.dead_end(['south'])
+    assert StartingCard() is PathCard.cross_road(special_card='start')
+    assert GoalCard(True).is_gold() and GoalCard(True) is PathCard.cross_road(special_card='gold')
+    assert GoalCard(False) is PathCard.cross_road(special_card='goal')
+    with pytest.raises(InvalidTunnel):
+        PathCard([('north', 'east'), ('south', 'west')])
+    with pytest.raises(ValueError):
+        ActionCard('theft')
+
+
+def test_dead_ends_of_any_order_are_the_cards_of_the_game():
+    types = list(CARD_TYPES)
+    type_ids = [card.get_type_id() for card in types]
+    for count in range(1, 5):
+        for directions in itertools.permutations(['north', 'east', 'south', 'west'], count):
+            card = PathCard.dead_end(list(directions))
+            assert card.get_exit_mask() == sum(DIRECTION_BITS[direction] for direction in directions)
+            assert card.get_links(card.get_exit_mask() & -card.get_exit_mask()) == 0
+            assert card.get_card_image(False) is CARD_IMAGES[card.get_type_id() << 1]
+    assert CARD_TYPES == types
+    assert [card.get_type_id() for card in CARD_TYPES] == type_ids
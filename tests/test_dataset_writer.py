@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from conftest import play_random_game
+from dataset_writer import DatasetWriter, DatasetReader, Trajectory, COLUMNS
+
+
+def play_rows(seed):
+    # the rows of one game of random moves
+    trajectory = Trajectory()
+    for env, action in play_random_game(seed, max_moves=1000):
+        trajectory.add(env, action)
+    return trajectory.finish(env)
+
+
+def test_rows_round_trip_across_shards_and_reopened_writers(tmp_path):
+    path = str(tmp_path / 'dataset')
+    games = [play_rows(seed) for seed in range(6)]
+    # the second writer carries on after the shards of the first, its trimmed last shard included
+    with DatasetWriter(path, rows_per_shard=100) as writer:
+        for rows in games[:3]:
+            writer.write(rows)
+    with DatasetWriter(path, rows_per_shard=100) as writer:
+        for rows in games[3:]:
+            writer.write(rows)
+
+    expected = {name: np.concatenate([rows[name] for rows in games]) for name in COLUMNS}
+    reader = DatasetReader(path)
+    assert len(reader) == len(expected['move'])
+    everything = reader.get_rows(np.arange(len(reader)))
+    for name in COLUMNS:
+        assert np.array_equal(everything[name], expected[name]), name
+
+    picked = np.array([len(reader) - 1, 0, 150, 150])
+    some = reader.get_rows(picked, columns=['seed', 'move'])
+    assert np.array_equal(some['seed'], expected['seed'][picked])
+    assert np.array_equal(some['move'], expected['move'][picked])
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
+
+
+def test_last_shard_is_trimmed(tmp_path):
+    path = str(tmp_path / 'dataset')
+    rows = play_rows(1)
+    with DatasetWriter(path, rows_per_shard=1000) as writer:
+        writer.write(rows)
+    for name, (dtype, shape) in COLUMNS.items():
+        column = np.load(os.path.join(path, 'shard-00000.{0}.npy'.format(name)))
+        assert column.shape == (len(rows['move']),) + shape
+
+
+def test_sample_draws_rows_of_the_dataset(tmp_path):
+    path = str(tmp_path / 'dataset')
+    rows = play_rows(2)
+    with DatasetWriter(path, rows_per_shard=16) as writer:
+        writer.write(rows)
+    sample = DatasetReader(path).sample(64, rng=np.random.default_rng(0), columns=['move'])['move']
+    assert sample.shape == (64,) and set(sample) <= set(rows['move'])
+
+
+def test_rows_follow_the_game():
+    trajectory = Trajectory()
+    cells = []
+    for env, action in play_random_game(5, max_moves=1000):
+        trajectory.add(env, action)
+        cells.append(bytes(env.board.get_cells()))
+    rows = trajectory.finish(env)
+    assert list(rows['move']) == list(range(len(cells))) and set(rows['seed']) == {5}
+    assert [bytes(row) for row in rows['cells']] == cells
+    winner = env.get_winner()
+    assert list(rows['outcome']) == [int(env.players[player].role == winner) for player in rows['player']]
+
+
+def test_seeds_above_the_signed_range_round_trip(tmp_path):
+    path = str(tmp_path / 'dataset')
+    seed = 2**63 + 1
+    with DatasetWriter(path) as writer:
+        writer.write(play_rows(seed))
+    rows = DatasetReader(path).get_rows(np.arange(3), columns=['seed', 'seeded'])
+    assert [int(value) for value in rows['seed']] == [seed] * 3 and list(rows['seeded']) == [1] * 3
+
+
+def test_unseeded_games_are_flagged():
+    rows = play_rows(None)
+    assert set(rows['seeded']) == {0} and set(rows['seed']) == {0}
+
+
+def test_seeds_the_column_cannot_hold_are_refused_at_the_first_move():
+    env, action = next(play_random_game(0))
+    trajectory = Trajectory()
+    for seed in (-1, 2**64, 'seed'):
+        env.seed = seed
+        with pytest.raises(ValueError):
+            trajectory.add(env, action)
+    assert len(trajectory) == 0
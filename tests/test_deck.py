@@ -0,0 +1,47 @@
+import random
+from collections import Counter
+from deck import Deck
+
+
+def test_put_back_undoes_a_draw():
+    random.seed(0)
+    deck = Deck()
+    before = deck.get_deck()
+    drawn = [deck.draw() for _ in range(3)]
+    assert len(deck) == len(before) - 3
+    for card in reversed(drawn):
+        deck.put_back(card)
+    assert deck.get_deck() == before
+
+
+def test_deal_matches_single_draws():
+    random.seed(1)
+    deck = Deck()
+    other = deck.clone()
+    hands = deck.deal(5, 4)
+    assert hands == [[other.draw() for _ in range(4)] for _ in range(5)]
+    assert deck.get_ids() == other.get_ids()
+
+
+def test_deal_stops_when_the_deck_runs_out():
+    random.seed(2)
+    deck = Deck()
+    size = len(deck)
+    hands = deck.deal(size // 4 + 2, 4)
+    assert deck.is_empty() and deck.draw_id() is None and deck.draw() is None
+    assert sum(len(hand) for hand in hands) == size
+    assert hands[-1] == []
+
+
+def test_clone_is_independent():
+    random.seed(3)
+    deck = Deck()
+    clone = deck.clone()
+    assert clone.get_deck() == deck.get_deck()
+    cards = Counter(deck.get_deck())
+    clone.draw(5)
+    random.seed(4)
+    clone.shuffle()
+    assert Counter(deck.get_deck()) == cards and len(deck) == len(clone) + 5
+    top = deck.get_ids()[-1]
+    assert deck.draw_id() == top and len(deck) == len(clone) + 4
@@ -0,0 +1,64 @@
+from collections import Counter
+import numpy as np
+import pytest
+from conftest import play_random_game
+from determinization import ROLE_POOL, unseen_counts
+from saboteur_base_environment import DISCARDED_FACE_UP
+
+
+def unseen_cards(env, player):
+    player_index = env.players.index(player)
+    discarded = [card.get_type_id() for card, owner in zip(env.discard_pile, env._discard_owners) if owner == player_index]
+    return Counter({type_id: count for type_id, count in enumerate(
+        unseen_counts([card.get_type_id() for card in player.hand], env.board.get_placed_counts(),
+                      env._played_counts, discarded)) if count})
+
+
+def check_samples(env, samples, player_index):
+    player = env.players[player_index]
+    unseen = unseen_cards(env, player)
+    own = [card.get_type_id() for card in player.hand]
+    for sample in range(samples.num_samples):
+        # the player keeps their hand and role, every other card comes out of the unseen pool
+        assert samples.get_hand(sample, player_index) == player.hand
+        assert samples.get_role(sample, player_index) == player.role
+        dealt = Counter(samples.get_deck_ids(sample).tolist())
+        for index, other in enumerate(env.players):
+            assert len(samples.get_hand(sample, index)) == len(other.hand)
+            if index != player_index:
+                dealt.update(card.get_type_id() for card in samples.get_hand(sample, index))
+        assert not dealt - unseen
+        assert len(samples.get_deck_ids(sample)) == len(env.deck)
+        roles = Counter(samples.roles[sample].tolist())
+        assert all(roles[index] <= count for index, count in enumerate(ROLE_POOL))
+        assert samples.gold[sample] in env.board.get_gold_candidates(env._peeked[player_index])
+    assert own == [card.get_type_id() for card in player.hand]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_samples_keep_what_the_player_knows(seed):
+    for move, (env, _) in enumerate(play_random_game(seed)):
+        if move % 10:
+            continue
+        player_index = move % len(env.players)
+        # the unseen pool is exactly the real hidden cards: the other hands, the deck and the others' discards
+        hidden = Counter(env.deck.get_ids().tolist())
+        for index, other in enumerate(env.players):
+            if index != player_index:
+                hidden.update(card.get_type_id() for card in other.hand)
+        hidden.update(card.get_type_id() for card, owner in zip(env.discard_pile, env._discard_owners)
+                      if owner not in (player_index, DISCARDED_FACE_UP))
+        assert hidden == unseen_cards(env, env.players[player_index])
+        hashed = env.get_hash()
+        check_samples(env, env.sample_determinizations(20, env.players[player_index]), player_index)
+        assert env.get_hash() == hashed
+
+
+def test_buffers_are_reused_and_seeded_samples_repeat():
+    env = next(play_random_game(3))[0]
+    samples = env.sample_determinizations(8)
+    assert env.sample_determinizations(8, out=samples) is samples
+    first = env.sample_determinizations(8, rng=np.random.default_rng(1))
+    hands = first.hands.copy()
+    again = env.sample_determinizations(8, rng=np.random.default_rng(1))
+    assert (again.hands == hands).all()
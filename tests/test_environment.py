@@ -0,0 +1,188 @@
+import random
+import pytest
+from conftest import random_path_card, play_random_game
+from card import PathCard, ActionCard
+from SaboteurPlayer import SaboteurPlayer
+from saboteur_app import choose_action
+from saboteur_base_environment import SaboteurBaseEnvironment, TOOLS, PICK, LANTERN, CART, DISCARDED_FACE_UP, flip_tool
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_vectorized_legal_actions_match_the_frontier_loop(seed):
+    rng = random.Random(seed)
+    env = SaboteurBaseEnvironment(seed=seed)
+    board = env.board
+    for _ in range(30):
+        for player in env.players:
+            assert env.get_legal_actions(player, vectorized=True) == env.get_legal_actions(player)
+        card = random_path_card(rng)
+        placements = board.get_placements(card.get_exit_mask())
+        if placements:
+            x, y, rotation = rng.choice(placements)
+            board.add_path_card(x, y, card.turned() if rotation else card)
+
+
+def snapshot(env):
+    # everything apply() can touch, the hash included
+    board = env.board
+    return (bytes(board._cells), list(board._cards), board.get_frontier(), bytes(board._requirements),
+            bytes(board._connected), board.gold_found(), board.get_placed_cells(),
+            bytes(env._played_counts), bytes(env._peeked), bytes(env._broken_tools),
+            [list(hand) for hand in env._hands], env._cards_in_hands,
+            bytes(env.deck.get_ids()), list(env.discard_pile), bytes(env._discard_owners), env.current_player_index,
+            env.current_player is env.players[env.current_player_index], env.get_hash())
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_undo_restores_every_field(seed):
+    tokens = []
+    snapshots = []
+    for env, _ in play_random_game(seed, tokens):
+        snapshots.append(snapshot(env))
+    kinds = {token[0][0] for token in tokens}
+    while tokens:
+        env.undo(tokens.pop())
+        assert snapshot(env) == snapshots.pop()
+    assert {'place', 'discard'} <= kinds
+
+
+def moves(seed):
+    return [(env.current_player_index, action, env.get_hash()) for env, action in play_random_game(seed)]
+
+
+def test_seeded_games_play_out_the_same():
+    random.seed(0)
+    first = moves(7)
+    random.seed(1)
+    assert moves(7) == first
+    assert moves(8) != first
+
+
+def test_generate_actions_targets_every_action_card():
+    env = SaboteurBaseEnvironment(seed=0, headless=True)
+    board = env.board
+    x, y, _ = board.get_placements(PathCard.cross_road().get_exit_mask())[0]
+    board.add_path_card(x, y, PathCard.cross_road())
+    gx, gy = board.get_goal_locations()[1]
+    board.reveal_card(gx, gy)
+    sabotage, mend, map_card, dynamite = (ActionCard.of(action) for action in ('sabotage', 'mend', 'map', 'dynamite'))
+    player = env.current_player
+    player.hand[:] = [sabotage, mend, map_card, dynamite, sabotage]
+    others = [index for index in range(len(env.players)) if index != env.current_player_index]
+    env._broken_tools[others[0]] = LANTERN
+    assert env.generate_actions() == (
+        [('sabotage', sabotage, index, tool) for index in others for tool in TOOLS
+         if not (index, tool) == (others[0], LANTERN)]
+        + [('mend', mend, others[0], LANTERN)]
+        + [('map', map_card, 0), ('map', map_card, 2), ('dynamite', dynamite, x, y)]
+        + [('discard', card) for card in (sabotage, mend, map_card, dynamite)])
+    player.hand[:] = []
+    assert env.generate_actions() == [('pass',)]
+
+
+def test_sabotage_and_mend_flip_one_tool():
+    env = SaboteurBaseEnvironment(seed=1, headless=True)
+    sabotage, mend = ActionCard.of('sabotage'), ActionCard.of('mend')
+    # the four moves are made by the players before the target
+    target = env.players[7]
+    assert env.get_legal_actions(target)
+    tokens = []
+    for kind, card, tool, broken in (('sabotage', sabotage, PICK, PICK), ('sabotage', sabotage, CART, PICK | CART),
+                                     ('mend', mend, PICK, CART), ('mend', mend, CART, 0)):
+        env.current_player.hand[0] = card
+        assert (kind, card, 7, tool) in env.generate_actions()
+        tokens.append(env.apply((kind, card, 7, tool)))
+        assert env.get_broken_tools(target) == broken
+        assert env.is_sabotaged(target) == (broken != 0)
+        # a player with a broken tool cannot place path cards
+        assert bool(env.get_legal_actions(target)) == (broken == 0)
+        assert any(action[0] == 'place' for action in env.generate_actions(target)) == (broken == 0)
+    while tokens:
+        env.undo(tokens.pop())
+    assert env.get_broken_tools(target) == 0
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_clones_play_on_independently(seed):
+    for move, (env, _) in enumerate(play_random_game(seed)):
+        if move % 15:
+            continue
+        before = snapshot(env)
+        first, second = env.clone(), env.clone()
+        assert snapshot(first) == before
+        rng = random.Random(move)
+        for _ in range(20):
+            if first.is_terminal():
+                break
+            action = rng.choice(first.generate_actions())
+            first.apply(action)
+            second.apply(action)
+            assert snapshot(first) == snapshot(second)
+        # nothing of the original changed, its hands and the hand sensors of its players included
+        assert snapshot(env) == before
+        assert all(player.hand is hand for player, hand in zip(env.players, env._hands))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_terminal_counters_follow_the_game(seed):
+    for env, _ in play_random_game(seed, max_moves=1000):
+        assert env._cards_in_hands == sum(len(hand) for hand in env._hands)
+        assert not env.is_terminal()
+    assert env.is_terminal()
+    assert env.board.gold_found() or not any(env._hands)
+    assert env.get_winner() == ('Gold-Digger' if env.board.gold_found() else 'Saboteur')
+
+
+def test_played_action_cards_go_face_up_on_the_discard_pile():
+    env = SaboteurBaseEnvironment(seed=2, headless=True)
+    map_card = ActionCard.of('map')
+    env.current_player.hand[0] = map_card
+    token = env.apply(('map', map_card, 0))
+    assert env.discard_pile[-1] is map_card and env._discard_owners[-1] == DISCARDED_FACE_UP
+    env.undo(token)
+    assert env.discard_pile == [] and len(env._discard_owners) == 0
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_rollouts_on_clones_leave_the_original_rng_alone(seed):
+    env = SaboteurBaseEnvironment(seed=seed, headless=True)
+    state = env.rng.getstate()
+    clone = env.clone()
+    assert clone.rng is not env.rng and clone.rng.getstate() == state
+    for _ in range(3):
+        if not clone.is_terminal():
+            clone.apply(choose_action(clone, clone.current_player))
+    assert env.rng.getstate() == state
+    assert env.clone(share_rng=True).rng is env.rng
+
+
+def test_play_goes_on_after_the_deck_runs_out():
+    moves_without_deck = 0
+    for seed in range(10):
+        for env, action in play_random_game(seed, max_moves=1000):
+            if env.deck.is_empty():
+                # nobody draws any more, the players play out the cards they hold
+                cards = env._cards_in_hands
+                token = env.apply(action)
+                assert env._cards_in_hands == cards - (action[0] != 'pass')
+                env.undo(token)
+                moves_without_deck += 1
+        assert env.board.gold_found() or not any(env._hands)
+    assert moves_without_deck
+
+
+def test_added_players_are_tracked_like_the_others():
+    env = SaboteurBaseEnvironment(seed=0, headless=True)
+    player = SaboteurPlayer('Player 9', env.players[0]._agent_program, 'Saboteur')
+    player.hand.extend(env.deck.draw(3))
+    cards = env._cards_in_hands
+    env.add_player(player)
+    assert env._cards_in_hands == cards + 3
+    assert env.get_broken_tools(player) == 0 and len(env._peeked) == len(env.players)
+
+
+def test_flip_tool_breaks_and_mends_one_bit():
+    broken = 0
+    for tool, expected in ((PICK, PICK), (CART, PICK | CART), (PICK, CART), (CART, 0)):
+        broken = flip_tool(broken, tool)
+        assert broken == expected
@@ -0,0 +1,230 @@
+import random
+import numpy as np
+import pytest
+from conftest import random_path_card, joined_exits
+from card import PathCard, NORTH, EAST, SOUTH, WEST, turn_exit_mask
+from game_board import (GameBoard, BOARD_WIDTH, BOARD_HEIGHT, CELL_OCCUPIED, CELL_START, CELL_GOAL, CELL_REVEALED,
+                        PLACE_AS_IS, PLACE_TURNED, placement_grid)
+
+# exit bit: (dx, dy, the exit bit facing back)
+STEPS = {NORTH: (0, -1, SOUTH), EAST: (1, 0, WEST), SOUTH: (0, 1, NORTH), WEST: (-1, 0, EAST)}
+
+
+def fits(board, x, y, exit_mask):
+    """Whether a card with the given exits can be placed at (x, y), worked out from the card objects around it."""
+    if board.get_item_value(x, y) is not None:
+        return False
+    touches = False
+    for bit, (dx, dy, opposite) in STEPS.items():
+        if not exit_mask & bit:
+            continue
+        neighbour = board.get_item_value(x + dx, y + dy)
+        if neighbour is not None and neighbour._special_card in ('start', None):
+            touches = True
+            if not neighbour.get_exit_mask() & opposite:
+                return False
+    return touches
+
+
+def place_random_cards(board, rng, count):
+    """Places up to count random path cards where they fit; returns the (x, y) of the cards placed."""
+    placed = []
+    for _ in range(count):
+        card = random_path_card(rng)
+        options = [(x, y) for x in range(BOARD_WIDTH) for y in range(BOARD_HEIGHT) if board.check_path_card(x, y, card)]
+        if options:
+            x, y = rng.choice(options)
+            board.add_path_card(x, y, card)
+            placed.append((x, y))
+    return placed
+
+
+def test_new_board_holds_the_start_and_hidden_goals():
+    board = GameBoard()
+    for x in range(BOARD_WIDTH):
+        for y in range(BOARD_HEIGHT):
+            code = board.get_cell(x, y)
+            if (x, y) == (board.start_x, board.start_y):
+                assert code == CELL_OCCUPIED | CELL_START | NORTH | EAST | SOUTH | WEST
+            elif (x, y) in ((14, 8), (14, 10), (14, 12)):
+                assert code & (CELL_OCCUPIED | CELL_GOAL | CELL_REVEALED) == CELL_OCCUPIED | CELL_GOAL
+            else:
+                assert code == 0 and board.get_item_value(x, y) is None
+    assert board.get_cell(-1, 0) == 0 and board.get_cell(0, BOARD_HEIGHT) == 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_check_path_card_matches_the_card_exits(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    for _ in range(25):
+        card = random_path_card(rng)
+        for x in range(BOARD_WIDTH):
+            for y in range(BOARD_HEIGHT):
+                assert board.check_path_card(x, y, card) == fits(board, x, y, card.get_exit_mask())
+        place_random_cards(board, rng, 1)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_cells_follow_placements_and_removals(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    placed = place_random_cards(board, rng, 30)
+    for x, y in placed:
+        card = board.get_item_value(x, y)
+        assert board.get_cell(x, y) == CELL_OCCUPIED | card.get_exit_mask()
+    x, y = placed[0]
+    board.remove_path_card(x, y)
+    assert board.get_cell(x, y) == 0 and board.get_item_value(x, y) is None
+    cross_road = PathCard.cross_road()
+    assert board.check_path_card(x, y, cross_road) == fits(board, x, y, cross_road.get_exit_mask())
+
+
+def scan_frontier(board):
+    # the empty cells next to the start card or a path card, found by looking at every cell
+    frontier = []
+    for x in range(BOARD_WIDTH):
+        for y in range(BOARD_HEIGHT):
+            if board.get_item_value(x, y) is not None:
+                continue
+            neighbours = [board.get_item_value(x + dx, y + dy) for dx, dy, _ in STEPS.values()]
+            if any(card is not None and card._special_card in ('start', None) for card in neighbours):
+                frontier.append((x, y))
+    return frontier
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_frontier_matches_a_scan_of_the_board(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    placed = []
+    for _ in range(60):
+        if placed and rng.random() < 0.15:
+            board.remove_path_card(*placed.pop(rng.randrange(len(placed))))
+        else:
+            placed += place_random_cards(board, rng, 1)
+        assert board.get_frontier() == scan_frontier(board)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_placements_match_both_orientations(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    for _ in range(20):
+        place_random_cards(board, rng, 2)
+        for exit_mask in range(16):
+            expected = []
+            for x, y in scan_frontier(board):
+                for rotation, mask in enumerate((exit_mask, turn_exit_mask(exit_mask))):
+                    if fits(board, x, y, mask):
+                        expected.append((x, y, rotation))
+            assert board.get_placements(exit_mask) == expected
+
+
+def flood(board):
+    """Returns the (x, y) of every card a tunnel from the start card reaches, searched from scratch."""
+    start = (board.start_x, board.start_y)
+    reached = {start}
+    # (cell, exit bit) pairs a tunnel leaves by
+    states = {(start, bit) for bit in STEPS}
+    stack = list(states)
+    while stack:
+        (x, y), bit = stack.pop()
+        if board.get_item_value(x, y)._special_card in ('goal', 'gold'):
+            continue
+        dx, dy, opposite = STEPS[bit]
+        neighbour = board.get_item_value(x + dx, y + dy)
+        if neighbour is None or not neighbour.get_exit_mask() & opposite:
+            continue
+        reached.add((x + dx, y + dy))
+        exits = joined_exits(neighbour, opposite)
+        for leaving in STEPS:
+            state = ((x + dx, y + dy), leaving)
+            if exits & leaving and state not in states:
+                states.add(state)
+                stack.append(state)
+    return reached
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_connectivity_matches_a_full_flood(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    placed = []
+    for _ in range(80):
+        if placed and rng.random() < 0.15:
+            # a dynamite: the tunnel network may fall apart
+            board.remove_path_card(*placed.pop(rng.randrange(len(placed))))
+        else:
+            placed += place_random_cards(board, rng, 1)
+        reached = flood(board)
+        connected = {(x, y) for x in range(BOARD_WIDTH) for y in range(BOARD_HEIGHT) if board.is_connected(x, y)}
+        assert connected == reached
+        gold = [location for location, goal in zip(board._goal_locations, board._goal_cards) if goal.is_gold()][0]
+        assert board.gold_found() == (gold in reached)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_placement_grid_matches_get_placements(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    boards = []
+    for count in (0, 10, 30):
+        board = GameBoard()
+        place_random_cards(board, rng, count)
+        boards.append(board)
+    exit_masks = list(range(16))
+    # one board, and the boards stacked
+    grids = [placement_grid(board.get_cell_grid(), exit_masks) for board in boards]
+    stacked = placement_grid(np.stack([board.get_cell_grid() for board in boards]), exit_masks)
+    for board, grid, stacked_grid in zip(boards, grids, stacked):
+        assert (grid == stacked_grid).all()
+        for exit_mask in exit_masks:
+            placements = []
+            for x in range(BOARD_WIDTH):
+                for y in range(BOARD_HEIGHT):
+                    fits = grid[exit_mask, y, x]
+                    placements += [(x, y, rotation) for rotation, bit in enumerate((PLACE_AS_IS, PLACE_TURNED)) if fits & bit]
+            assert placements == board.get_placements(exit_mask)
+
+
+def board_snapshot(board):
+    return (bytes(board._cells), list(board._cards), board.get_frontier(), bytes(board._requirements),
+            bytes(board._connected), board.gold_found())
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_undo_takes_back_placements_and_dynamites(seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = GameBoard()
+    placed = place_random_cards(board, rng, 30)
+    for x, y in placed:
+        before = board_snapshot(board)
+        card = board.get_item_value(x, y)
+        change = board.remove_path_card(x, y)
+        board.undo_remove_path_card(x, y, change)
+        assert board_snapshot(board) == before
+        board.remove_path_card(x, y)
+        middle = board_snapshot(board)
+        change = board.add_path_card(x, y, card)
+        board.undo_add_path_card(x, y, change)
+        assert board_snapshot(board) == middle
+        board.add_path_card(x, y, card)
+
+
+def test_connected_and_requirements_views_are_read_only():
+    board = GameBoard(headless=True)
+    x, y, _ = board.get_placements(PathCard.cross_road().get_exit_mask())[0]
+    board.add_path_card(x, y, PathCard.cross_road())
+    connected, requirements = board.get_connected(), board.get_requirements()
+    assert bytes(connected) == bytes(board._connected) and bytes(requirements) == bytes(board._requirements)
+    assert connected[y * BOARD_WIDTH + x] and not requirements[y * BOARD_WIDTH + x]
+    for view in (connected, requirements):
+        with pytest.raises(TypeError):
+            view[0] = 1
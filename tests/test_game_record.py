@@ -0,0 +1,55 @@
+import random
+import pytest
+from conftest import play_random_game
+from game_record import GameRecorder, Replay, load_records, read_records, encode_move, decode_move, MAX_SEED
+from saboteur_base_environment import SaboteurBaseEnvironment
+
+
+def record_game(seed):
+    """Plays a random seeded game; returns its record bytes and the state before every move and at the end."""
+    recorder = None
+    states = []
+    for env, action in play_random_game(seed, max_moves=1000):
+        if recorder is None:
+            recorder = GameRecorder(env)
+        states.append(env.to_state())
+        recorder.record(action)
+    states.append(env.to_state())
+    return recorder.to_bytes(), states
+
+
+def test_records_round_trip_through_a_file(tmp_path):
+    games = [record_game(seed) for seed in (3, 4, 2 ** 63, MAX_SEED)]
+    path = tmp_path / 'games.bin'
+    path.write_bytes(b''.join(data for data, _ in games))
+    records = load_records(str(path))
+    assert [seed for seed, _, _ in records] == [3, 4, 2 ** 63, MAX_SEED]
+    for (seed, num_players, moves), (_, states) in zip(records, games):
+        assert num_players == 8 and len(moves) == len(states) - 1
+        for move in moves:
+            assert encode_move(decode_move(move)) == bytes(move.tolist())
+
+
+def test_empty_file_holds_no_records(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    assert load_records(str(path)) == []
+
+
+@pytest.mark.parametrize('seed', [-1, MAX_SEED + 1, 'seed', 1.5])
+def test_recorder_rejects_seeds_the_header_cannot_hold(seed):
+    with pytest.raises(ValueError):
+        GameRecorder(SaboteurBaseEnvironment(headless=True, seed=seed))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_seek_matches_a_straight_replay(seed):
+    data, states = record_game(seed)
+    _, _, moves = next(read_records(data))
+    replay = Replay(seed, moves, snapshot_interval=8)
+    indices = list(range(len(moves) + 1))
+    random.Random(seed).shuffle(indices)
+    for index in indices:
+        assert replay.seek(index).to_state() == states[index]
+    with pytest.raises(IndexError):
+        replay.seek(len(moves) + 1)
@@ -0,0 +1,41 @@
+import pickle
+import pytest
+import game_state
+from conftest import play_random_game
+from saboteur_base_environment import SaboteurBaseEnvironment
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_step_matches_apply(seed):
+    state = None
+    for env, action in play_random_game(seed, max_moves=1000):
+        if state is None:
+            state = env.to_state()
+        assert game_state.is_terminal(state) is False
+        assert game_state.legal_actions(state) == env.generate_actions()
+        assert game_state.turn(state) == env.current_player._agent_name
+        state = game_state.step(state, action)
+        expected = env.clone()
+        expected.apply(action)
+        assert state == expected.to_state() and state.zobrist == expected.get_hash()
+    assert game_state.is_terminal(state)
+    winner = env.get_winner()
+    for index, player in enumerate(env.players):
+        assert game_state.payoff(state, index) == (1 if player.role == winner else 0)
+
+
+def test_step_leaves_the_state_alone():
+    state = SaboteurBaseEnvironment(headless=True, seed=1).to_state()
+    copy = pickle.loads(pickle.dumps(state))
+    for action in game_state.legal_actions(state):
+        game_state.step(state, action)
+    assert state == copy and hash(state) == hash(copy)
+
+
+def test_from_state_round_trips():
+    for move, (env, _) in enumerate(play_random_game(2)):
+        if move == 30:
+            break
+    state = env.to_state()
+    assert SaboteurBaseEnvironment.from_state(state).to_state() == state
+    assert pickle.loads(pickle.dumps(state)) == state
@@ -0,0 +1,56 @@
+import random
+import numpy as np
+import pytest
+import game_board
+from conftest import play_random_game
+from observation import ObservationEncoder, NUM_PLANES
+
+
+def fresh(env, player=None):
+    # the planes encoded from scratch by an encoder that has never seen env
+    return ObservationEncoder().encode(env, player).copy()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_incremental_planes_match_a_fresh_encode(seed):
+    observers = random.Random(-seed)
+    tokens = []
+    for env, _ in play_random_game(seed, tokens, max_moves=1000):
+        planes = env.get_observation()
+        assert planes.shape == (NUM_PLANES, 20, 20) and not planes.flags.writeable
+        assert np.array_equal(planes, fresh(env))
+        player = observers.choice(env.players)
+        assert np.array_equal(env.get_observation(player), fresh(env, player))
+    while tokens:
+        env.undo(tokens.pop())
+        assert np.array_equal(env.get_observation(), fresh(env))
+
+
+def test_planes_follow_dynamites_and_their_undo():
+    cut = False
+    for seed in range(30):
+        for env, _ in play_random_game(seed, max_moves=1000):
+            for action in env.generate_actions():
+                if action[0] == 'dynamite':
+                    cut = cut or env.board.is_connected(action[2], action[3])
+                    token = env.apply(action)
+                    assert np.array_equal(env.get_observation(), fresh(env))
+                    env.undo(token)
+                    assert np.array_equal(env.get_observation(), fresh(env))
+    assert cut
+
+
+def test_planes_survive_the_change_log_being_cut_back(monkeypatch):
+    monkeypatch.setattr(game_board, 'CHANGE_LOG_LIMIT', 8)
+    for env, _ in play_random_game(3, max_moves=1000):
+        assert len(env.board._changes) <= 8
+        assert np.array_equal(env.get_observation(), fresh(env))
+    assert env.board._changes_epoch > 1
+
+
+def test_unobserved_boards_keep_no_change_log():
+    for move, (env, _) in enumerate(play_random_game(4)):
+        if move == 20:
+            break
+    assert env.board._changes == []
+    assert env.clone().board._changes == []
@@ -0,0 +1,15 @@
+import saboteur_app
+
+
+def test_headless_game_writes_nothing(capfd):
+    winners = saboteur_app.main(headless=True, seed=0)
+    assert winners
+    assert capfd.readouterr().out == ''
+
+
+def test_seeded_games_print_the_same(capfd):
+    runs = []
+    for _ in range(2):
+        winners = saboteur_app.main(seed=5)
+        runs.append((winners, capfd.readouterr().out))
+    assert runs[0] == runs[1] and runs[0][1]
@@ -0,0 +1,51 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import self_play
+
+
+@pytest.mark.parametrize('wins, games', [(0, 10), (3, 10), (10, 10), (500, 1000)])
+def test_wilson_interval_holds_the_rate(wins, games):
+    low, high = self_play.wilson_interval(wins, games)
+    assert 0.0 <= low <= wins / games <= high <= 1.0
+    # the bounds solve |rate - p| = z * sqrt(p * (1 - p) / games)
+    for bound in (low, high):
+        if 0.0 < bound < 1.0:
+            assert abs(wins / games - bound) == pytest.approx(1.96 * math.sqrt(bound * (1 - bound) / games))
+
+
+def test_wilson_interval_narrows_with_more_games():
+    assert self_play.wilson_interval(0, 0) == (0.0, 1.0)
+    small = self_play.wilson_interval(30, 100)
+    large = self_play.wilson_interval(3000, 10000)
+    assert large[1] - large[0] < small[1] - small[0]
+
+
+def test_pool_plays_the_same_games_as_a_loop():
+    results = sorted(result for chunk in self_play.run(12, seed=40, workers=2, chunk_size=5) for result in chunk)
+    assert [result.seed for result in results] == list(range(40, 52))
+    for result in results:
+        alone = self_play.play_game(result.seed)
+        assert result[:4] == alone[:4]
+    stats = self_play.SelfPlayStats()
+    for result in results:
+        stats.add(result)
+    assert sum(stats.wins.values()) == stats.games == 12
+    assert '12 games' in stats.summary()
+
+
+def test_run_keeps_two_chunks_per_worker_in_flight(monkeypatch):
+    submitted = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, *args):
+            submitted.append(args[1])
+            return super().submit(*args)
+
+    monkeypatch.setattr(self_play, 'ProcessPoolExecutor', CountingExecutor)
+    received = []
+    for chunk in self_play.run(9, seed=0, workers=2, chunk_size=1):
+        received.append(chunk)
+        assert len(submitted) - len(received) <= 2 * 2
+    assert sorted(result.seed for chunk in received for result in chunk) == list(range(9))
+    assert len(submitted) == 9
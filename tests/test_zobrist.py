@@ -0,0 +1,50 @@
+from collections import Counter
+import pytest
+from conftest import play_random_game
+from game_board import GOAL_CARD, BOARD_WIDTH, BOARD_HEIGHT
+from saboteur_base_environment import SaboteurBaseEnvironment, TOOLS
+from zobrist import BOARD_KEYS, TURN_KEYS, TOOL_KEYS, hand_key
+
+
+def full_hash(env):
+    """The Zobrist hash of env worked out from scratch."""
+    board = env.board
+    value = TURN_KEYS[env.current_player_index]
+    for x in range(BOARD_WIDTH):
+        for y in range(BOARD_HEIGHT):
+            card = board.get_item_value(x, y)
+            if card is None:
+                continue
+            revealed = 0
+            if card.get_kind() in ('goal', 'gold'):
+                revealed = int(board.is_revealed(x, y))
+                if not revealed:
+                    # a face down goal hashes the same whether it holds the gold or not
+                    card = GOAL_CARD
+            value ^= BOARD_KEYS[((y * BOARD_WIDTH + x) << 8) | (card.get_type_id() << 2) | revealed]
+    for player_index, player in enumerate(env.players):
+        for kind, count in Counter(card.get_kind() for card in env.get_hand(player)).items():
+            for copy in range(count):
+                value ^= hand_key(player_index, kind, copy)
+        for tool in TOOLS:
+            if env.get_broken_tools(player) & tool:
+                value ^= TOOL_KEYS[(player_index << 3) | tool]
+    return value
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_hash_matches_a_full_recompute(seed):
+    tokens = []
+    for env, _ in play_random_game(seed, tokens):
+        assert env.get_hash() == full_hash(env)
+    assert env.get_hash() == full_hash(env)
+    while tokens:
+        env.undo(tokens.pop())
+        assert env.get_hash() == full_hash(env)
+
+
+def test_hash_ignores_the_order_of_a_hand():
+    env = SaboteurBaseEnvironment(seed=0)
+    hashed = env.get_hash()
+    env.players[0].hand.reverse()
+    assert env.get_hash() == hashed == full_hash(env)
@@ -0,0 +1,38 @@
+"""
+Zobrist keys for hashing Saboteur game states.
+All keys come from fixed seeds, so the same state hashes to the same value in every process.
+"""
+from array import array
+from functools import lru_cache
+import random
+import sys
+
+BOARD_CELLS = 20 * 20
+
+
+def _random_keys(count, seed):
+    keys = array('Q')
+    keys.frombytes(random.Random(seed).randbytes(8 * count))
+    if sys.byteorder == 'big':
+        # keep the keys identical on every machine
+        keys.byteswap()
+    return keys
+
+
+# indexed by (cell index << 8) | (card type id << 2) | reveal state, see GameBoard._cell_key
+BOARD_KEYS = _random_keys(BOARD_CELLS * 256, 'saboteur-board')
+
+# indexed by the index of the player whose turn it is
+TURN_KEYS = _random_keys(64, 'saboteur-turn')
+
+# indexed by (player index << 3) | tool bit, one key per broken tool of a player
+TOOL_KEYS = _random_keys(64 * 8, 'saboteur-tools')
+
+
+@lru_cache(maxsize=None)
+def hand_key(player_index, kind, count):
+    """
+    Returns the key of the count-th copy (counting from 0) of a card kind in the hand of a player.
+    XOR-ing one key per copy hashes the hand as a multiset, so the order of the cards does not matter.
+    """
+    return random.Random('saboteur-hand:{0}:{1}:{2}'.format(player_index, kind, count)).getrandbits(64)